@@ -0,0 +1,288 @@
+# backend/admission.py
+"""
+Контроль допуска (admission control) для /predict по оценке памяти и CPU.
+
+Стоимость запроса определяется длиной сетки ресемплинга: (tmax - tmin) / step_days.
+Загрузка за несколько лет при шаге 1 ч или битая колонка TIME с выбросом на миллион дней
+раздувают np.arange(tmin, tmax, step), промежуточные массивы и фрейм tsfresh — воркер падает по OOM.
+
+Поэтому до пайплайна:
+ - estimate_cost() по одной колонке TIME (без чтения потока) оценивает длину сетки,
+   пиковую память и время tsfresh — константы откалиброваны по bench.pipeline (см. ниже);
+ - AdmissionController.plan() сравнивает оценку с лимитами и либо пропускает запрос как есть,
+   либо огрубляет шаг сетки (degrade), либо отклоняет (413);
+ - AdmissionController.reserve()/run() резервируют память/слот в общем бюджете на время вычисления:
+   если бюджет занят — запрос ждёт в очереди, не дождался — 503 с Retry-After.
+
+В pre-fork режиме (serve.py) бюджет общий для всех воркеров: занятость и счётчики решений
+(admitted/degraded/...) — в разделяемой памяти, /stats на любом воркере показывает сумму.
+"""
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict
+
+import numpy as np
+
+# -------------------------
+# Модель стоимости
+# -------------------------
+# Откалибровано по `python -m bench.pipeline` (synth small/medium/large, tracemalloc + время стадий):
+# память растёт линейно по сырым точкам (массивы, raw_curve в JSON) и сверхлинейно по точкам сетки
+# (tsfresh: часть признаков строит матрицы ~n^2). Оценка намеренно с запасом.
+BYTES_PER_RAW_POINT = 200.0
+BYTES_PER_GRID_POINT = 200.0
+TSFRESH_MEMORY = {            # пресет -> (байт на точку, байт на точку^2)
+    "minimal": (150.0, 0.0),
+    "efficient": (5500.0, 0.31),
+    "comprehensive": (9000.0, 0.9),
+}
+TSFRESH_SECONDS = {           # пресет -> (фикс. накладные, с на точку, с на точку^2)
+    "minimal": (0.25, 1e-5, 0.0),
+    "efficient": (0.25, 1.15e-4, 3.2e-9),
+    "comprehensive": (0.5, 6e-4, 2e-8),
+}
+# чтение FITS, склейка, сортировка, ресемплинг (bincount) и детренд: O(сырых точек),
+# ~1.2–1.7 мкс на точку по synth small/large/xlarge — берём с запасом
+LOAD_RESAMPLE_SECONDS_PER_POINT = 2e-6
+CANDIDATES_SECONDS_PER_GRID_POINT = 3e-5
+# mode=segments: tsfresh с n_jobs > 1 считает в пуле процессов — у каждого своя память
+# (~31 МБ USS на процесс по synth large при 2 и 4 процессах) и старт пула (~0.2–0.4 с на процесс);
+# такой запрос занимает n_jobs слотов конкуренции (ядер), а не один
+TSFRESH_JOB_MEMORY_BYTES = 32 * 1024 * 1024
+TSFRESH_JOB_START_SECONDS = 0.4
+
+MB = 1024 * 1024
+
+# -------------------------
+# Лимиты (переопределяются переменными окружения)
+# -------------------------
+MEMORY_BUDGET_MB = float(os.environ.get("EXO_ADMISSION_MEMORY_MB", 2048))   # общий бюджет на все запросы
+MAX_CONCURRENT = int(os.environ.get("EXO_ADMISSION_CONCURRENCY", os.cpu_count() or 1))
+MAX_REQUEST_CPU_S = float(os.environ.get("EXO_ADMISSION_MAX_CPU_S", 120))    # дороже — огрубляем шаг
+MAX_QUEUE_WAIT_S = float(os.environ.get("EXO_ADMISSION_QUEUE_S", 30))
+MAX_GRID_POINTS = int(os.environ.get("EXO_ADMISSION_MAX_GRID_POINTS", 500_000))
+# во сколько раз можно огрубить шаг сетки (1 ч -> 2 ч -> ... -> 1 сут); дальше — отказ
+DEGRADE_FACTORS = (1, 2, 3, 4, 6, 8, 12, 24)
+POLL_S = 0.05
+LOCK_POLL_S = 0.001  # лок держат микросекунды: ждём его короткими паузами
+COUNTERS = ("admitted", "degraded", "rejected", "timeouts")
+
+
+@dataclass
+class CostEstimate:
+    n_points: int
+    time_span_days: float
+    step_days: float
+    med_kernel_hours: int
+    grid_points: int
+    peak_memory_mb: float
+    cpu_seconds: float
+    tsfresh: str
+    jobs: int = 1  # процессов tsfresh (слотов конкуренции) на запрос
+    degraded: bool = False
+    degrade_factor: int = 1
+    queued_s: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d["peak_memory_mb"] = round(d["peak_memory_mb"], 1)
+        d["cpu_seconds"] = round(d["cpu_seconds"], 2)
+        d["queued_s"] = round(d["queued_s"], 3)
+        return d
+
+
+class AdmissionRejected(Exception):
+    """Запрос не помещается в лимиты даже при самом грубом шаге."""
+
+    def __init__(self, message: str, estimate: CostEstimate):
+        super().__init__(message)
+        self.estimate = estimate
+
+
+class AdmissionTimeout(Exception):
+    """Бюджет не освободился за MAX_QUEUE_WAIT_S."""
+
+
+def estimate_cost(time_columns, step_days: float, med_kernel_hours: int, tsfresh: str,
+                  jobs: int = 1) -> CostEstimate:
+    """
+    Оценка по колонкам TIME всех загруженных файлов (flux не читается).
+    jobs — n_jobs tsfresh (mode=segments): при jobs > 1 добавляются память и старт процессов пула.
+    """
+    n_points = 0
+    tmin, tmax = np.inf, -np.inf
+    for t in time_columns:
+        t = t[np.isfinite(t)]
+        if len(t) == 0:
+            continue
+        n_points += len(t)
+        tmin = min(tmin, float(t.min()))
+        tmax = max(tmax, float(t.max()))
+    span = float(tmax - tmin) if n_points else 0.0
+    grid = int(span / step_days) + 1 if n_points else 0
+
+    mem_lin, mem_sq = TSFRESH_MEMORY.get(tsfresh, TSFRESH_MEMORY["efficient"])
+    sec_fix, sec_lin, sec_sq = TSFRESH_SECONDS.get(tsfresh, TSFRESH_SECONDS["efficient"])
+    peak = (BYTES_PER_RAW_POINT * n_points + BYTES_PER_GRID_POINT * grid
+            + mem_lin * grid + mem_sq * float(grid) ** 2)
+    cpu = (sec_fix + sec_lin * grid + sec_sq * float(grid) ** 2
+           + LOAD_RESAMPLE_SECONDS_PER_POINT * n_points
+           + CANDIDATES_SECONDS_PER_GRID_POINT * grid)
+    jobs = max(1, int(jobs))
+    if jobs > 1:
+        peak += TSFRESH_JOB_MEMORY_BYTES * jobs
+        cpu += TSFRESH_JOB_START_SECONDS * jobs
+    return CostEstimate(n_points=n_points, time_span_days=span, step_days=step_days,
+                        med_kernel_hours=med_kernel_hours, grid_points=grid,
+                        peak_memory_mb=peak / MB, cpu_seconds=cpu, tsfresh=tsfresh, jobs=jobs)
+
+
+class AdmissionController:
+    """
+    Общий бюджет памяти (МБ) и число одновременно выполняемых тяжёлых запросов.
+    Резерв берётся по оценке peak_memory_mb и отпускается по завершении вычисления.
+    """
+
+    def __init__(self, memory_budget_mb: float = MEMORY_BUDGET_MB, max_concurrent: int = MAX_CONCURRENT,
+                 max_request_cpu_s: float = MAX_REQUEST_CPU_S, max_queue_wait_s: float = MAX_QUEUE_WAIT_S,
+                 max_grid_points: int = MAX_GRID_POINTS):
+        self.memory_budget_mb = float(memory_budget_mb)
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_request_cpu_s = float(max_request_cpu_s)
+        self.max_queue_wait_s = float(max_queue_wait_s)
+        self.max_grid_points = int(max_grid_points)
+        self._lock = threading.Lock()
+        # [занято КБ, выполняется, в очереди] — в pre-fork режиме переезжает в разделяемую память
+        self._usage = [0, 0, 0]
+        # счётчики решений в порядке COUNTERS — тоже переезжают в разделяемую память
+        self._counts = [0] * len(COUNTERS)
+
+    # ---- pre-fork ----
+    def enable_shared(self) -> None:
+        """Вызывается в master-процессе ДО fork: бюджет становится общим для всех воркеров."""
+        # резерв упавшего воркера не возвращается до перезапуска master — оценки с запасом это терпят
+        if isinstance(self._usage, list):
+            self._lock = multiprocessing.Lock()
+            self._usage = multiprocessing.RawArray('q', self._usage)
+            self._counts = multiprocessing.RawArray('q', self._counts)
+
+    def _count(self, name: str) -> None:
+        """Вызывается под self._lock."""
+        self._counts[COUNTERS.index(name)] += 1
+
+    @contextlib.asynccontextmanager
+    async def _locked_async(self):
+        """
+        self._lock из async-кода. В pre-fork режиме это multiprocessing.Lock: блокирующий acquire
+        остановил бы event loop, пока лок держит другой воркер, — берём его без ожидания и уступаем циклу.
+        Под локом — только несколько операций с целыми (никаких await и ввода-вывода).
+        """
+        while not self._lock.acquire(False):
+            await asyncio.sleep(LOCK_POLL_S)
+        try:
+            yield
+        finally:
+            self._lock.release()
+
+    # ---- решение ----
+    def _fits(self, est: CostEstimate) -> bool:
+        return (est.peak_memory_mb <= self.memory_budget_mb
+                and est.cpu_seconds <= self.max_request_cpu_s
+                and est.grid_points <= self.max_grid_points)
+
+    def plan(self, estimate_fn: Callable[[float, int], CostEstimate], step_days: float,
+             med_kernel_hours: int) -> CostEstimate:
+        """
+        Подбирает шаг сетки: исходный, если запрос помещается в лимиты, иначе шаг * k
+        (ядро медианного фильтра сохраняет длительность в часах). Не помещается и при
+        максимальном k — AdmissionRejected.
+        """
+        est = estimate_fn(step_days, med_kernel_hours)
+        for k in DEGRADE_FACTORS:
+            if k > 1:
+                est = estimate_fn(step_days * k, max(3, int(round(med_kernel_hours / k))))
+                est.degraded = True
+                est.degrade_factor = k
+            if self._fits(est):
+                with self._lock:
+                    self._count("degraded" if k > 1 else "admitted")
+                return est
+        with self._lock:
+            self._count("rejected")
+        raise AdmissionRejected(
+            f"Upload too large to process: {est.n_points} points over {est.time_span_days:.1f} days "
+            f"-> {est.grid_points} grid points even at step x{DEGRADE_FACTORS[-1]} "
+            f"(~{est.peak_memory_mb:.0f} MB, ~{est.cpu_seconds:.0f} s). Check the TIME column for outliers.",
+            est)
+
+    # ---- резерв бюджета ----
+    def _take(self, kb: int, slots: int) -> bool:
+        """Вызывается под self._lock. slots — занятые ядра (jobs оценки)."""
+        used_kb, running = self._usage[0], self._usage[1]
+        # один запрос допускается всегда, даже если его оценка больше свободного бюджета
+        if running == 0 or (running + slots <= self.max_concurrent
+                            and used_kb + kb <= self.memory_budget_mb * 1024):
+            self._usage[0] += kb
+            self._usage[1] += slots
+            return True
+        return False
+
+    async def _try_reserve(self, kb: int, slots: int) -> bool:
+        async with self._locked_async():
+            return self._take(kb, slots)
+
+    def _release(self, kb: int, slots: int) -> None:
+        # блокирующий acquire: освобождение не должно потеряться при отмене задачи,
+        # а секция под локом у всех участников — несколько операций с целыми (микросекунды)
+        with self._lock:
+            self._usage[0] -= kb
+            self._usage[1] -= slots
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, est: CostEstimate):
+        """Ждёт места в бюджете (не дольше max_queue_wait_s) и держит резерв до выхода из блока."""
+        kb = int(est.peak_memory_mb * 1024) + 1
+        slots = max(1, est.jobs)
+        t0 = time.monotonic()
+        if not await self._try_reserve(kb, slots):
+            async with self._locked_async():
+                self._usage[2] += 1
+            try:
+                # опрос, а не Condition: резерв может освободить другой воркер (разделяемая память)
+                while not await self._try_reserve(kb, slots):
+                    if time.monotonic() - t0 > self.max_queue_wait_s:
+                        async with self._locked_async():
+                            self._count("timeouts")
+                        raise AdmissionTimeout(
+                            f"Server busy: no memory budget for ~{est.peak_memory_mb:.0f} MB "
+                            f"within {self.max_queue_wait_s:.0f} s")
+                    await asyncio.sleep(POLL_S)
+            finally:
+                with self._lock:  # как в _release: не теряем при отмене
+                    self._usage[2] -= 1
+        est.queued_s = time.monotonic() - t0
+        try:
+            yield est
+        finally:
+            self._release(kb, slots)
+
+    async def run(self, est: CostEstimate, fn: Callable[[], Awaitable[Any]]) -> Any:
+        async with self.reserve(est):
+            return await fn()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            used_kb, running, queued = self._usage[0], self._usage[1], self._usage[2]
+            counters = dict(zip(COUNTERS, (int(c) for c in self._counts)))
+        return dict(counters,
+                    reserved_mb=round(used_kb / 1024, 1),
+                    running=int(running),
+                    queued=int(queued),
+                    memory_budget_mb=self.memory_budget_mb,
+                    max_concurrent=self.max_concurrent,
+                    shared=not isinstance(self._usage, list))
@@ -0,0 +1,171 @@
+# backend/artifacts.py
+"""
+Хранилище артефактов модели с атомарной подменой (hot reload).
+
+Идея:
+ - loader() загружает ВСЕ артефакты разом и возвращает один объект (набор);
+ - запрос в начале берёт ссылку на текущий набор (current()) и работает только с ней,
+   поэтому reload() просто подменяет ссылку — запросы «в полёте» дорабатывают на старом наборе;
+ - в pre-fork режиме (serve.py) набор загружается один раз в master-процессе и достаётся
+   воркерам через fork copy-on-write; общий счётчик версий (shared memory) позволяет
+   одному воркеру объявить reload, а остальным — подхватить его при следующем запросе.
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+
+def fingerprint_files(paths: List[str]) -> str:
+    """Короткий отпечаток набора файлов (путь, размер, mtime) — меняется при подмене файлов."""
+    h = hashlib.sha1()
+    for p in paths:
+        try:
+            st = os.stat(p)
+            h.update(f"{p}:{st.st_size}:{st.st_mtime_ns};".encode())
+        except OSError:
+            h.update(f"{p}:missing;".encode())
+    return h.hexdigest()[:12]
+
+
+class ArtifactStore:
+    """
+    Текущий набор артефактов + номер версии.
+    current() — дёшево (одна проверка счётчика), reload() — загрузка и атомарная подмена.
+    """
+
+    def __init__(self, loader: Callable[[], Any],
+                 paths: Union[List[str], Callable[[], List[str]], None] = None):
+        self._loader = loader
+        # список файлов или функция, которая его вернёт (набор файлов может меняться вместе с манифестом)
+        self._paths = paths if callable(paths) else list(paths or [])
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._current: Any = None
+        self._version = 0
+        self._fingerprint: Optional[str] = None
+        self._loaded_at: Optional[float] = None
+        # неудачная догрузка общей версии: _version остаётся версией реально загруженного набора
+        self._failed_version: Optional[int] = None
+        self._last_error: Optional[str] = None
+        self._shared_version = None  # multiprocessing.Value, см. enable_shared_version()
+
+    def _files(self) -> List[str]:
+        return self._paths() if callable(self._paths) else self._paths
+
+    # ---- загрузка / подмена ----
+    def _swap(self, new: Any, version: int, fingerprint: str) -> None:
+        # одно присваивание ссылки под локом: читатели видят либо старый, либо новый набор целиком
+        with self._lock:
+            self._current = new
+            self._version = version
+            self._fingerprint = fingerprint
+            self._loaded_at = time.time()
+            self._failed_version = None
+            self._last_error = None
+
+    def load(self) -> Any:
+        """Первая загрузка (при импорте main)."""
+        fp = fingerprint_files(self._files())
+        self._swap(self._loader(), max(self._version, 1), fp)
+        return self._current
+
+    def reload(self) -> Dict[str, Any]:
+        """
+        Загружает артефакты заново и подменяет набор. При ошибке загрузки старый набор остаётся.
+        В pre-fork режиме увеличивает общий счётчик версий, чтобы остальные воркеры перечитали файлы.
+        """
+        fp = fingerprint_files(self._files())
+        new = self._loader()  # может бросить исключение — тогда ничего не меняем
+        if self._shared_version is not None:
+            with self._shared_version.get_lock():
+                self._shared_version.value += 1
+                version = int(self._shared_version.value)
+        else:
+            version = self._version + 1
+        self._swap(new, version, fp)
+        return self.info()
+
+    def _start_follow(self, target: int) -> None:
+        """
+        Запускает догрузку версии, объявленной другим воркером, в фоновом потоке.
+        current() вызывается из async-обработчиков: загрузка прямо в нём остановила бы event loop
+        и все запросы воркера. Пока новый набор грузится, запросы получают старый.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # уже обновляется — пока отдаём старый набор
+        try:
+            threading.Thread(target=self._follow_shared, args=(target,),
+                             name="artifacts-follow", daemon=True).start()
+        except Exception:
+            self._refresh_lock.release()
+            raise
+
+    def _follow_shared(self, target: int) -> None:
+        """Догоняем версию target (в фоновом потоке, _refresh_lock уже взят в _start_follow)."""
+        try:
+            self._load_version(target)
+        finally:
+            self._refresh_lock.release()
+
+    def _load_version(self, target: int) -> None:
+        """Загрузка набора версии target под _refresh_lock. Ошибка не меняет _version — только failed_version."""
+        if self._version >= target:
+            return
+        try:
+            new = self._loader()
+        except Exception as e:
+            print(f"Artifacts reload to version {target} failed, keeping version {self._version}: {e}")
+            with self._lock:
+                # не пытаемся снова на каждом запросе: повтор — при следующем объявлении версии
+                self._failed_version = target
+                self._last_error = str(e)
+            return
+        self._swap(new, target, fingerprint_files(self._files()))
+
+    def _pending_version(self) -> Optional[int]:
+        shared = self._shared_version
+        if shared is None:
+            return None
+        target = shared.value
+        if target > self._version and target != self._failed_version:
+            return target
+        return None
+
+    def current(self) -> Any:
+        target = self._pending_version()
+        if target is not None:
+            self._start_follow(target)
+        return self._current
+
+    def catch_up(self) -> None:
+        """
+        Синхронно догоняет общую версию. Для воркера, который master форкнул заново после падения:
+        master держит исходный набор, а остальные воркеры могли уже уйти на новую версию —
+        догружаем её до приёма запросов, а не ждём следующего reload.
+        """
+        target = self._pending_version()
+        if target is None:
+            return
+        with self._refresh_lock:
+            self._load_version(target)
+
+    # ---- pre-fork ----
+    def enable_shared_version(self) -> None:
+        """Вызывается в master-процессе ДО fork: счётчик версий в разделяемой памяти."""
+        if self._shared_version is None:
+            self._shared_version = multiprocessing.Value('q', self._version)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "version": self._version,
+            "fingerprint": self._fingerprint,
+            "loaded_at": self._loaded_at,
+            "failed_version": self._failed_version,
+            "last_error": self._last_error,
+            "pid": os.getpid(),
+            "shared": self._shared_version is not None,
+            "files": self._files(),
+        }
@@ -0,0 +1,5 @@
+# backend/bench/__init__.py
+"""
+Бенчмарки и стенды для backend.
+Запуск из каталога backend:  python -m bench.pipeline --help
+"""
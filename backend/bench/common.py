@@ -0,0 +1,103 @@
+# backend/bench/common.py
+"""
+Общие утилиты для бенчмарков: импорт backend, метаданные окружения, таймер, JSON.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "bench", "results")
+
+
+def import_backend():
+    """
+    Импортирует main.py так же, как uvicorn: из каталога backend
+    (пути к артефактам модели в main.py относительные).
+    """
+    os.chdir(BACKEND_DIR)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import main
+    return main
+
+
+def git_revision() -> Dict[str, object]:
+    """Текущий коммит и флаг «грязного» дерева (для сравнения между коммитами)."""
+    def _git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True,
+                                  text=True, timeout=10).stdout.strip()
+        except Exception:
+            return ""
+    return {
+        "commit": _git("rev-parse", "HEAD") or None,
+        "subject": _git("log", "-1", "--format=%s") or None,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def environment_meta() -> Dict[str, object]:
+    import numpy as np
+    import pandas as pd
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    try:
+        import tsfresh
+        meta["tsfresh"] = tsfresh.__version__
+    except Exception:
+        pass
+    return meta
+
+
+def time_call(fn: Callable, repeat: int = 3) -> Dict[str, object]:
+    """
+    Вызывает fn() repeat раз, возвращает статистику по wall-time (секунды)
+    и результат последнего вызова в ключе 'result' (не сериализуется).
+    """
+    runs: List[float] = []
+    result = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - t0)
+    runs_sorted = sorted(runs)
+    return {
+        "min": runs_sorted[0],
+        "median": runs_sorted[len(runs_sorted) // 2],
+        "mean": sum(runs) / len(runs),
+        "runs": runs,
+        "result": result,
+    }
+
+
+def strip_results(obj):
+    """Убирает несериализуемые 'result' из вложенных словарей time_call."""
+    if isinstance(obj, dict):
+        return {k: strip_results(v) for k, v in obj.items() if k != "result"}
+    if isinstance(obj, list):
+        return [strip_results(v) for v in obj]
+    return obj
+
+
+def save_json(payload: Dict[str, object], path: str) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(strip_results(payload), fh, indent=2, ensure_ascii=False)
+    return path
+
+
+def default_output_path(prefix: str) -> str:
+    rev = git_revision()
+    short = (rev["commit"] or "nogit")[:10] + ("-dirty" if rev["dirty"] else "")
+    return os.path.join(RESULTS_DIR, f"{prefix}-{short}.json")
@@ -0,0 +1,402 @@
+# backend/bench/injection.py
+"""
+Injection-recovery: пропускная способность стадий детекции при заданной полноте (completeness).
+
+В кривые без транзитов (синтетические bench.synth или сохранённые FITS) инжектируются транзиты —
+box или с квадратичным потемнением к краю — по сетке глубина × длительность × период.
+Инжекция идёт в поток в e-/s на исходных каденсах (как его читает /predict), затем кривая проходит
+срез выбросов, ресемплинг и детренд /predict (стадия 2, _stage_process_curve): на сетке поток
+суммируется по боксам, а медианный фильтр частично съедает длинные транзиты — полнота учитывает и это.
+Синтетические базовые кривые по умолчанию без одиночных выбросов: после среза выбросов их боксы
+неполные, это провалы глубже любого транзита, и transits находит их вместо инжекции.
+Затем параллельными батчами (процессы, --workers) выполняются стадии детекции /predict:
+ - regions    — detect_suspicious_regions: найден, если какой-то регион накрывает середину транзита;
+ - transits   — detect_transit_candidates: найден, если центр кандидата ближе max(длительность/2, шаг сетки);
+ - classifier — tsfresh + модель, один extract_features/predict на батч: найден, если p > threshold.
+На кривых без инжекции для классификатора считается доля ложных срабатываний (false positive rate);
+у regions/transits без транзитов совпадать не с чем — для них она не считается.
+
+По умолчанию считается только transits: на синтетических кривых regions и classifier ничего не находят
+при любой глубине. Порог regions — 1.5 std детрендованного потока, а std на сетке ~10% уровня
+(каденс 29.4 мин даёт то 2, то 3 точки в часовом боксе); транзит глубже ~1% уровня срезается
+как выброс раньше. Классификатор обучен на многоквартальных кривых Kepler и на синтетике отвечает
+в основном на длину кривой. Эти стадии — через --stages, лучше со своими кривыми (--base).
+Если полнота какой-то стадии 0, сетка ничего не измеряет — код выхода 1 (и с таким --compare тоже).
+
+Отчёт: полнота по стадиям и по ячейкам сетки, CPU-секунды и wall-время на кривую,
+кривых на CPU-секунду (ресемплинг/детренд — отдельной строкой prepare).
+С --compare сравнивает с прошлым JSON и завершается с кодом 1, если полнота какой-то стадии упала больше чем на --max-drop: ускорение не должно стоить качества.
+
+Примеры (из каталога backend):
+    python -m bench.injection
+    python -m bench.injection --depths 100,500,2000 --durations 2,4,8 --periods 3,10,30 --shape limb
+    python -m bench.injection --n-base 16 --workers 4
+    python -m bench.injection --base quiet_star_q1.fits quiet_star_q2.fits --stages transits,classifier
+    python -m bench.injection --compare bench/results/injection-abc123.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bench import synth
+from bench.common import default_output_path, environment_meta, git_revision, import_backend, save_json
+
+STAGES = ["regions", "transits", "classifier"]
+SHAPES = ["box", "limb"]
+# квадратичное потемнение к краю, близко к Солнцу в полосе Kepler
+LIMB_DARKENING = (0.40, 0.26)
+
+Curve = Tuple[np.ndarray, np.ndarray]   # (время каденсов, поток в e-/s — как его читает /predict)
+
+
+# -------------------------
+# Базовые кривые
+# -------------------------
+def _finite(t: np.ndarray, f: np.ndarray) -> Curve:
+    good = np.isfinite(t) & np.isfinite(f)
+    return t[good], np.asarray(f[good], dtype=np.float64)
+
+
+def make_base_curves(n: int, quarters: int, seed: int, outlier_fraction: float = 0.0) -> List[Curve]:
+    """Кривые bench.synth без транзитов, поток в исходном масштабе (у каждого квартала свой уровень)."""
+    curves = []
+    for i in range(n):
+        parts = [_finite(t, f) for t, f in synth.make_light_curve(n_quarters=quarters, period_days=None,
+                                                                  outlier_fraction=outlier_fraction,
+                                                                  seed=seed + i)]
+        curves.append((np.concatenate([t for t, _ in parts]), np.concatenate([f for _, f in parts])))
+    return curves
+
+
+def load_base_curves(main, paths: List[str]) -> List[Curve]:
+    """Сохранённые кривые: каждый FITS-файл — отдельная базовая кривая (желательно без транзитов)."""
+    curves = []
+    for path in paths:
+        with open(path, "rb") as fh:
+            t, f = main.read_time_flux_from_fitsbytes(fh.read())
+        curves.append(_finite(t, f))
+    return curves
+
+
+# -------------------------
+# Модель транзита и инжекция
+# -------------------------
+def transit_dip(time: np.ndarray, period: float, epoch: float, duration_days: float,
+                depth: float, shape: str = "box") -> np.ndarray:
+    """
+    Понижение потока (>= 0) для серии транзитов.
+    box  — прямоугольный транзит глубины depth;
+    limb — приближение малой планеты с центральным прохождением (b = 0): глубина в момент t
+           пропорциональна яркости диска I(mu) в точке под планетой, в середине транзита равна depth.
+    """
+    phase = np.mod(time - epoch + 0.5 * period, period) - 0.5 * period
+    r = np.abs(phase) / (0.5 * duration_days)   # расстояние от центра диска в радиусах звезды
+    inside = r < 1.0
+    dip = np.zeros(len(time), dtype=np.float64)
+    if shape == "box":
+        dip[inside] = depth
+    else:
+        u1, u2 = LIMB_DARKENING
+        one_minus_mu = 1.0 - np.sqrt(1.0 - r[inside] ** 2)
+        dip[inside] = depth * (1.0 - u1 * one_minus_mu - u2 * one_minus_mu ** 2)
+    return dip
+
+
+def inject(curve: Curve, task: dict, shape: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Поток с транзитами задачи task и середины транзитов, попавших в кривую."""
+    t, flux = curve
+    if task["cell"] is None:
+        return flux, np.empty(0)
+    depth_ppm, duration_h, period = task["params"]
+    rng = np.random.default_rng(task["seed"])
+    epoch = float(t[0]) + rng.uniform(0.0, period)
+    # глубина относительная: поток в e-/s умножается на (1 - dip) — то же, что вычесть dip из
+    # нормированного на медиану потока и умножить обратно; классификатор видит привычный масштаб
+    injected = flux * (1.0 - transit_dip(t, period, epoch, duration_h / 24.0, depth_ppm * 1e-6, shape))
+    mids = epoch + period * np.arange(int((t[-1] - epoch) // period) + 1)
+    # середины, попавшие в разрывы данных, не считаются: их нечем обнаружить
+    half = 0.5 * duration_h / 24.0
+    left = np.searchsorted(t, mids - half)
+    right = np.searchsorted(t, mids + half)
+    return injected, mids[right > left]
+
+
+# -------------------------
+# Батч в процессе-воркере
+# -------------------------
+_WORKER: Dict[str, object] = {}
+
+
+def _init_worker(base_curves: List[Curve], stages: List[str], shape: str) -> None:
+    main = import_backend()
+    registry = main.ARTIFACTS.current()
+    _WORKER.update(main=main, bundle=registry.get(registry.resolve("predict")),
+                   base=base_curves, stages=stages, shape=shape)
+
+
+def _timed(fn):
+    w0, c0 = time.perf_counter(), time.process_time()
+    result = fn()
+    return result, time.perf_counter() - w0, time.process_time() - c0
+
+
+def _classify_batch(main, bundle, fluxes: List[np.ndarray]) -> np.ndarray:
+    """Как _stage_classify, но все кривые батча — один фрейм tsfresh (свой id) и один predict."""
+    df_tsf = pd.DataFrame({
+        'id': np.concatenate([np.full(len(f), i, dtype=np.int32) for i, f in enumerate(fluxes)]),
+        'time': np.concatenate([np.arange(len(f), dtype=float) for f in fluxes]),
+        'flux': np.concatenate(fluxes),
+    })
+    X_new = main._features_matrix(df_tsf, bundle, 1)
+    proba = main._predict_rows(X_new, bundle)
+    by_id = dict(zip(X_new.index.tolist(), proba.tolist()))
+    return np.array([by_id[i] for i in range(len(fluxes))])
+
+
+def run_batch(tasks: List[dict]) -> dict:
+    main, bundle = _WORKER["main"], _WORKER["bundle"]
+    stages, shape = _WORKER["stages"], _WORKER["shape"]
+    step_days, med_kernel_hours, min_points = main._preprocessing_params(bundle)
+
+    def _prepare():
+        out = []
+        for task in tasks:
+            t = _WORKER["base"][task["base"]][0]
+            flux, mids = inject(_WORKER["base"][task["base"]], task, shape)
+            grid, flux_detr = main._stage_process_curve(t, flux.astype(main._flux_dtype(bundle)),
+                                                        step_days, med_kernel_hours, min_points)
+            out.append((grid, flux_detr, mids))
+        return out
+
+    curves, wall, cpu = _timed(_prepare)
+    timing = {"prepare": (wall, cpu)}
+    found = {s: [False] * len(tasks) for s in stages}
+    if "regions" in stages:
+        res, wall, cpu = _timed(lambda: [main.detect_suspicious_regions(g, f, num_regions=5) for g, f, _ in curves])
+        timing["regions"] = (wall, cpu)
+        for k, ((_, _, mids), regions) in enumerate(zip(curves, res)):
+            found["regions"][k] = any(r['start'] <= m <= r['end'] for r in regions for m in mids)
+    if "transits" in stages:
+        def _transits():
+            out = []
+            for g, f, _ in curves:
+                try:
+                    out.append(main.detect_transit_candidates(g, f, n_candidates=5))
+                except Exception:
+                    out.append([])  # как в _stage_candidates
+            return out
+        res, wall, cpu = _timed(_transits)
+        timing["transits"] = (wall, cpu)
+        for k, ((g, _, mids), cands) in enumerate(zip(curves, res)):
+            tol = max(0.5 * tasks[k]["params"][1] / 24.0, float(g[1] - g[0])) if tasks[k]["cell"] is not None else 0.0
+            found["transits"][k] = any(abs(c['center_time'] - m) <= tol for c in cands for m in mids)
+    if "classifier" in stages:
+        proba, wall, cpu = _timed(lambda: _classify_batch(main, bundle, [f for _, f, _ in curves]))
+        timing["classifier"] = (wall, cpu)
+        found["classifier"] = [bool(p > bundle.threshold) for p in proba]
+
+    return {
+        "records": [{"cell": t["cell"], "found": {s: found[s][k] for s in stages}} for k, t in enumerate(tasks)],
+        "timing": timing,
+        "n": len(tasks),
+    }
+
+
+# -------------------------
+# Сетка, запуск, отчёт
+# -------------------------
+def _floats(s: str) -> List[float]:
+    return [float(x) for x in s.split(",") if x.strip()]
+
+
+def make_tasks(cells: List[Tuple[float, float, float]], n_base: int, seed: int) -> List[dict]:
+    """Каждая ячейка сетки на каждой базовой кривой + каждая базовая кривая без инжекции."""
+    tasks = [{"cell": None, "params": None, "base": b, "seed": 0} for b in range(n_base)]
+    for ci, params in enumerate(cells):
+        for b in range(n_base):
+            tasks.append({"cell": ci, "params": params, "base": b, "seed": seed * 1_000_003 + ci * 1009 + b})
+    return tasks
+
+
+def run(tasks: List[dict], base: List[Curve], stages: List[str], shape: str,
+        workers: int, batch_size: int) -> Tuple[List[dict], float]:
+    batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+    t0 = time.perf_counter()
+    if workers <= 1:
+        _init_worker(base, stages, shape)
+        results = [run_batch(b) for b in batches]
+    else:
+        # fork (где есть): воркеры наследуют уже импортированный main и загруженные модели
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(base, stages, shape)) as pool:
+            results = list(pool.map(run_batch, batches))
+    return results, time.perf_counter() - t0
+
+
+def summarize(results: List[dict], cells: List[Tuple[float, float, float]], stages: List[str]) -> dict:
+    records = [r for res in results for r in res["records"]]
+    n_total = sum(res["n"] for res in results)
+    out = {"stages": {}, "cells": []}
+    wall = sum(res["timing"]["prepare"][0] for res in results)
+    cpu = sum(res["timing"]["prepare"][1] for res in results)
+    out["prepare"] = {"wall_ms_per_curve": wall / n_total * 1e3, "cpu_ms_per_curve": cpu / n_total * 1e3}
+    for s in stages:
+        wall = sum(res["timing"][s][0] for res in results)
+        cpu = sum(res["timing"][s][1] for res in results)
+        inj = [r["found"][s] for r in records if r["cell"] is not None]
+        base = [r["found"][s] for r in records if r["cell"] is None] if s == "classifier" else []
+        out["stages"][s] = {
+            "completeness": float(np.mean(inj)) if inj else None,
+            "false_positive_rate": float(np.mean(base)) if base else None,
+            "wall_ms_per_curve": wall / n_total * 1e3,
+            "cpu_ms_per_curve": cpu / n_total * 1e3,
+            "curves_per_cpu_s": n_total / cpu if cpu > 0 else None,
+            "cpu_s": cpu,
+        }
+    for ci, (depth, duration, period) in enumerate(cells):
+        recs = [r for r in records if r["cell"] == ci]
+        out["cells"].append({
+            "depth_ppm": depth, "duration_h": duration, "period_d": period, "n": len(recs),
+            "completeness": {s: float(np.mean([r["found"][s] for r in recs])) for s in stages},
+        })
+    return out
+
+
+def depth_duration_table(summary: dict, stage: str) -> List[str]:
+    """Полнота стадии: строки — глубина, столбцы — длительность (среднее по периодам)."""
+    depths = sorted({c["depth_ppm"] for c in summary["cells"]})
+    durations = sorted({c["duration_h"] for c in summary["cells"]})
+    lines = [f"  {stage} completeness (rows: depth ppm, cols: duration h, mean over periods)",
+             "  " + f"{'':>8}" + "".join(f"{d:>8g}" for d in durations)]
+    for depth in depths:
+        row = []
+        for d in durations:
+            vals = [c["completeness"][stage] for c in summary["cells"]
+                    if c["depth_ppm"] == depth and c["duration_h"] == d]
+            row.append(f"{np.mean(vals):>8.2f}")
+        lines.append("  " + f"{depth:>8g}" + "".join(row))
+    return lines
+
+
+def compare(summary: dict, params: dict, baseline_path: str, max_drop: float) -> Tuple[List[str], List[str]]:
+    """Полнота и CPU на кривую против прошлого прогона; стадии, где полнота упала больше max_drop."""
+    with open(baseline_path, encoding="utf-8") as fh:
+        base = json.load(fh)
+    lines = [f"baseline: {base.get('git', {}).get('commit')}"]
+    grid_keys = ("depths_ppm", "durations_h", "periods_d", "shape", "n_base", "base", "quarters",
+                 "outlier_fraction", "seed")
+    if any(base.get("params", {}).get(k) != params.get(k) for k in grid_keys):
+        lines.append("WARNING: baseline used a different injection grid or base curves, completeness is not comparable")
+    lines.append(f"{'stage':<12} {'compl. base':>11} {'compl. curr':>11} {'cpu ms base':>12} {'cpu ms curr':>12} {'ratio':>7}")
+    failed = []
+    for s, cur in summary["stages"].items():
+        old = base.get("summary", {}).get("stages", {}).get(s)
+        if not old or old.get("completeness") is None or cur["completeness"] is None:
+            continue
+        if old["completeness"] == 0:
+            # падать некуда: такой baseline не поймает регрессию
+            lines.append(f"{s:<12} baseline completeness is 0, drop cannot be measured")
+            failed.append(s)
+            continue
+        ratio = cur["cpu_ms_per_curve"] / old["cpu_ms_per_curve"] if old["cpu_ms_per_curve"] > 0 else float("nan")
+        lines.append(f"{s:<12} {old['completeness']:>11.3f} {cur['completeness']:>11.3f} "
+                     f"{old['cpu_ms_per_curve']:>12.1f} {cur['cpu_ms_per_curve']:>12.1f} {ratio:>7.2f}")
+        if old["completeness"] - cur["completeness"] > max_drop:
+            failed.append(s)
+    return lines, failed
+
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description="Injection-recovery: detection throughput at a given completeness")
+    ap.add_argument("--depths", default="200,1000,3000", help="transit depths, ppm")
+    ap.add_argument("--durations", default="2,6,16", help="transit durations, hours")
+    ap.add_argument("--periods", default="2.5,8,25", help="orbital periods, days")
+    ap.add_argument("--shape", choices=SHAPES, default="box", help="box or limb-darkened transit")
+    ap.add_argument("--stages", default="transits", help=f"comma-separated subset of {STAGES}")
+    ap.add_argument("--base", nargs="*", default=None, help="FITS light curves without transits, one base curve each")
+    ap.add_argument("--n-base", type=int, default=8, help="synthetic base curves (without --base)")
+    ap.add_argument("--quarters", type=int, default=1, help="quarters per synthetic base curve")
+    ap.add_argument("--outlier-fraction", type=float, default=0.0,
+                    help="single-cadence outliers in synthetic base curves (bench.synth default is 0.002)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--batch-size", type=int, default=16)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="output JSON (default bench/results/injection-<commit>.json)")
+    ap.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    ap.add_argument("--max-drop", type=float, default=0.05,
+                    help="max allowed completeness drop vs --compare baseline; exceeded -> exit code 1")
+    args = ap.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        ap.error(f"unknown stages: {unknown}")
+
+    main = import_backend()
+    registry = main.ARTIFACTS.current()
+    bundle = registry.get(registry.resolve("predict"))
+    if args.base:
+        base = load_base_curves(main, args.base)
+    else:
+        base = make_base_curves(args.n_base, args.quarters, args.seed, args.outlier_fraction)
+    if not base:
+        ap.error("no base curves")
+
+    cells = [(d, w, p) for d in _floats(args.depths) for w in _floats(args.durations) for p in _floats(args.periods)]
+    tasks = make_tasks(cells, len(base), args.seed)
+    print(f"{len(base)} base curves x {len(cells)} cells + {len(base)} uninjected = {len(tasks)} curves, "
+          f"{len(base[0][0])} cadences each, {args.workers} workers, batches of {args.batch_size}")
+    results, wall = run(tasks, base, stages, args.shape, args.workers, args.batch_size)
+    summary = summarize(results, cells, stages)
+    summary["wall_s"] = wall
+    summary["curves_per_s"] = len(tasks) / wall
+
+    for s, v in summary["stages"].items():
+        fpr = "" if v["false_positive_rate"] is None else f" fpr={v['false_positive_rate']:.3f}"
+        print(f"[{s}] completeness={v['completeness']:.3f}{fpr} "
+              f"wall={v['wall_ms_per_curve']:.1f}ms/curve cpu={v['cpu_ms_per_curve']:.1f}ms/curve "
+              f"({v['curves_per_cpu_s']:.1f} curves/cpu-s)")
+        print("\n".join(depth_duration_table(summary, s)))
+    print(f"[prepare] resample+detrend cpu={summary['prepare']['cpu_ms_per_curve']:.1f}ms/curve")
+    print(f"total: {len(tasks)} curves in {wall:.1f}s wall ({summary['curves_per_s']:.1f} curves/s)")
+
+    payload: Dict[str, object] = {
+        "benchmark": "injection",
+        "git": git_revision(),
+        "env": environment_meta(),
+        "params": {"depths_ppm": _floats(args.depths), "durations_h": _floats(args.durations),
+                   "periods_d": _floats(args.periods), "shape": args.shape, "stages": stages,
+                   "n_base": len(base), "base": args.base, "quarters": args.quarters,
+                   "outlier_fraction": args.outlier_fraction,
+                   "workers": args.workers, "batch_size": args.batch_size, "seed": args.seed,
+                   "threshold": bundle.threshold, "model": bundle.name},
+        "summary": summary,
+    }
+    path = save_json(payload, args.out or default_output_path("injection"))
+    print(f"saved: {path}")
+    blind = [s for s, v in summary["stages"].items() if v["completeness"] == 0]
+    if blind:
+        print(f"FAIL: completeness is 0 for stages: {', '.join(blind)} — the grid measures nothing there, "
+              f"use deeper/longer transits, other base curves or drop these stages")
+        return 1
+    if args.compare:
+        lines, failed = compare(summary, payload["params"], args.compare, args.max_drop)
+        print("\n".join(lines))
+        if failed:
+            print(f"FAIL: completeness dropped by more than {args.max_drop} for stages: {', '.join(failed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,469 @@
+# backend/bench/load.py
+"""
+Нагрузочный тест локального сервера: смесь запросов, перцентили латентности, RSS воркеров и SLO.
+
+Поднимает сервер (serve.py с --workers N или один процесс uvicorn) на свободном порту,
+либо работает по уже запущенному (--url, RSS — по --pid). Запросы — смесь (--mix):
+ - predict             — POST /predict, несколько FITS одной цели (bench.synth, --fits-size);
+ - predict_second_csv  — POST /predict_second с CSV (--csv-rows строк);
+ - predict_second_form — POST /predict_second, ручной ввод одной строки через форму.
+Цели FITS разные (--targets): одинаковые загрузки single-flight склеил бы в одно вычисление.
+
+Режимы нагрузки:
+ - --rate R > 0 — открытая модель: приходы по Пуассону с интенсивностью R запросов/с,
+   одновременно не больше --concurrency; латентность считается от запланированного прихода,
+   то есть включает ожидание свободного слота (без coordinated omission);
+ - --rate 0 — закрытая модель: --concurrency клиентов шлют запросы друг за другом.
+
+Отчёт: пропускная способность, p50/p95/p99/max, доля ошибок (по статусам) — всего и по видам запросов,
+временной ряд по окнам --window (rps, p95, ошибки, RSS каждого воркера из /proc; только Linux).
+SLO (--slo, можно несколько раз): p50_ms/p95_ms/p99_ms/max_ms/error_rate/rss_mb — верхние границы,
+rps — нижняя; с префиксом вида запроса — только для него (predict.p95_ms=8000).
+Нарушено хоть одно — код выхода 1.
+
+Примеры (из каталога backend):
+    python -m bench.load --workers 2 --concurrency 4 --duration 60
+    python -m bench.load --rate 0.5 --duration 120 --mix predict=0.5,predict_second_csv=0.3,predict_second_form=0.2 \\
+        --slo p95_ms=8000 --slo predict.p99_ms=20000 --slo error_rate=0.01 --slo rss_mb=1500
+    python -m bench.load --url http://localhost:8000 --pid 12345 --requests 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from bench import synth
+from bench.common import BACKEND_DIR, default_output_path, environment_meta, git_revision, save_json
+
+KINDS = ["predict", "predict_second_csv", "predict_second_form"]
+SLO_MAX = ("p50_ms", "p95_ms", "p99_ms", "max_ms", "error_rate", "rss_mb")
+SLO_MIN = ("rps",)
+READY_TIMEOUT_S = 180.0
+
+
+# -------------------------
+# Сервер и RSS
+# -------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind: str, workers: int, port: int) -> subprocess.Popen:
+    """serve.py (pre-fork master + воркеры) или uvicorn в одном процессе; вывод сервера — в наш stderr."""
+    if kind == "serve":
+        cmd = [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=sys.stderr, stderr=sys.stderr, start_new_session=True)
+
+
+def wait_ready(url: str, proc: Optional[subprocess.Popen], timeout_s: float = READY_TIMEOUT_S) -> float:
+    """Ждёт ответа GET /models (артефакты загружены); возвращает время старта, с."""
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < timeout_s:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode} before becoming ready")
+        try:
+            if httpx.get(f"{url}/models", timeout=2.0).status_code == 200:
+                return time.monotonic() - t0
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"server at {url} not ready after {timeout_s:.0f}s")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        return None
+    return None
+
+
+def _children(pid: int) -> List[int]:
+    out = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", encoding="ascii", errors="replace") as fh:
+                # поле ppid — четвёртое, после имени в скобках (имя может содержать пробелы)
+                ppid = int(fh.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            out.append(int(name))
+    return out
+
+
+class RssSampler:
+    """Фоновый поток: раз в interval_s RSS процесса сервера и его прямых потомков (воркеров serve.py)."""
+
+    def __init__(self, pid: Optional[int], interval_s: float = 1.0):
+        self.pid = pid
+        self.interval_s = interval_s
+        self.samples: List[Dict[str, object]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.t0 = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.pid is not None and os.path.exists(f"/proc/{self.pid}/status")
+
+    def _sample(self) -> None:
+        procs = {self.pid: _rss_mb(self.pid)}
+        for child in _children(self.pid):
+            procs[child] = _rss_mb(child)
+        procs = {str(p): round(v, 1) for p, v in procs.items() if v is not None}
+        self.samples.append({"t": round(time.monotonic() - self.t0, 2), "rss_mb": procs})
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self._sample()
+
+    def start(self, t0: float) -> None:
+        self.t0 = t0
+        if self.available:
+            self._sample()
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._sample()
+
+    def worker_peaks(self) -> Dict[str, float]:
+        """Пиковый RSS по каждому процессу; в pre-fork режиме master не обслуживает запросы и не считается."""
+        peaks: Dict[str, float] = {}
+        for s in self.samples:
+            for pid, mb in s["rss_mb"].items():
+                peaks[pid] = max(peaks.get(pid, 0.0), mb)
+        if len(peaks) > 1:
+            peaks.pop(str(self.pid), None)
+        return peaks
+
+
+# -------------------------
+# Запросы
+# -------------------------
+def make_payloads(fits_size: str, targets: int, csv_rows: int, seed: int) -> Dict[str, list]:
+    """Готовые тела запросов: список вариантов на каждый вид."""
+    csv_bytes = synth.make_features_csv(csv_rows, seed=seed)
+    header, first = csv_bytes.decode("utf-8").splitlines()[:2]
+    form = dict(zip(header.split(","), first.split(",")))
+    return {
+        "predict": [synth.make_fits_set(fits_size, seed=seed + i) for i in range(max(1, targets))],
+        "predict_second_csv": [csv_bytes],
+        "predict_second_form": [form],
+    }
+
+
+async def send(client, kind: str, payload) -> int:
+    if kind == "predict":
+        files = [("files", (name, data, "application/octet-stream")) for name, data in payload]
+        r = await client.post("/predict", files=files)
+    elif kind == "predict_second_csv":
+        r = await client.post("/predict_second", files={"csv_file": ("load.csv", payload, "text/csv")})
+    else:
+        r = await client.post("/predict_second", data=payload)
+    await r.aread()
+    return r.status_code
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in KINDS:
+            raise ValueError(f"unknown request kind {name!r}, expected one of {KINDS}")
+        mix[name] = float(weight or 1.0)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("empty request mix")
+    return mix
+
+
+async def run_load(url: str, payloads: Dict[str, list], mix: Dict[str, float], concurrency: int,
+                   rate: float, duration_s: float, n_requests: int, warmup: int, timeout_s: float,
+                   seed: int, on_start: Optional[Callable[[float], None]] = None) -> Tuple[List[dict], float]:
+    """
+    Возвращает записи [{kind, t, latency_s, status, error}] (t — момент прихода от начала замера)
+    и длительность замера. Первые warmup запросов выполняются до замера и не записываются.
+    on_start(t0) вызывается после прогрева с тем же t0, от которого отсчитываются записи (старт RSS).
+    """
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    counters = {k: 0 for k in KINDS}
+
+    def _next_request():
+        kind = rng.choices(kinds, weights)[0]
+        variants = payloads[kind]
+        payload = variants[counters[kind] % len(variants)]
+        counters[kind] += 1
+        return kind, payload
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    records: List[dict] = []
+    async with httpx.AsyncClient(base_url=url, timeout=timeout_s, limits=limits) as client:
+        for _ in range(warmup):
+            await send(client, *_next_request())
+
+        sem = asyncio.Semaphore(concurrency)
+        t0 = time.monotonic()
+        if on_start is not None:
+            on_start(t0)
+
+        async def _one(kind, payload, arrival):
+            async with sem:
+                status, error = None, None
+                try:
+                    status = await send(client, kind, payload)
+                    if status >= 400:
+                        error = str(status)
+                except httpx.TimeoutException:
+                    error = "timeout"
+                except httpx.HTTPError as e:
+                    error = type(e).__name__
+                done = time.monotonic()
+            records.append({"kind": kind, "t": arrival - t0, "latency_s": done - arrival,
+                            "status": status, "error": error})
+
+        def _more(sent: int) -> bool:
+            if n_requests and sent >= n_requests:
+                return False
+            return not duration_s or time.monotonic() - t0 < duration_s
+
+        if rate > 0:
+            tasks, sent, next_at = [], 0, t0
+            while _more(sent):
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(_one(*_next_request(), next_at)))
+                sent += 1
+                next_at += rng.expovariate(rate)
+            await asyncio.gather(*tasks)
+        else:
+            state = {"sent": 0}
+
+            async def _client():
+                while _more(state["sent"]):
+                    state["sent"] += 1
+                    await _one(*_next_request(), time.monotonic())
+            await asyncio.gather(*[_client() for _ in range(concurrency)])
+        elapsed = time.monotonic() - t0
+    return records, elapsed
+
+
+# -------------------------
+# Отчёт и SLO
+# -------------------------
+def latency_stats(records: List[dict], elapsed_s: float) -> Dict[str, object]:
+    ok = np.array([r["latency_s"] for r in records if r["error"] is None]) * 1e3
+    errors: Dict[str, int] = {}
+    for r in records:
+        if r["error"] is not None:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    out: Dict[str, object] = {
+        "requests": len(records),
+        "ok": int(len(ok)),
+        "errors": errors,
+        "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+        "rps": len(ok) / elapsed_s if elapsed_s > 0 else 0.0,
+    }
+    for q in (50, 95, 99):
+        out[f"p{q}_ms"] = float(np.percentile(ok, q)) if len(ok) else None
+    out["max_ms"] = float(ok.max()) if len(ok) else None
+    out["mean_ms"] = float(ok.mean()) if len(ok) else None
+    return out
+
+
+def timeline(records: List[dict], rss: RssSampler, window_s: float, elapsed_s: float) -> List[Dict[str, object]]:
+    """Окна по моменту завершения запроса: rps, p95, ошибки и RSS (последний замер в окне) по воркерам."""
+    out = []
+    n_windows = max(1, int(np.ceil(elapsed_s / window_s)))
+    for w in range(n_windows):
+        lo, hi = w * window_s, (w + 1) * window_s
+        recs = [r for r in records if lo <= r["t"] + r["latency_s"] < hi]
+        ok = [r["latency_s"] * 1e3 for r in recs if r["error"] is None]
+        rss_in = [s["rss_mb"] for s in rss.samples if lo <= s["t"] < hi]
+        out.append({
+            "t": hi,
+            "rps": len(ok) / window_s,
+            "p95_ms": float(np.percentile(ok, 95)) if ok else None,
+            "errors": len(recs) - len(ok),
+            "rss_mb": rss_in[-1] if rss_in else None,
+        })
+    return out
+
+
+def parse_slo(specs: List[str]) -> List[Tuple[Optional[str], str, float]]:
+    """"p95_ms=8000" / "predict.p99_ms=20000" -> [(вид запроса или None, метрика, порог)]."""
+    out = []
+    for spec in specs:
+        key, _, value = spec.partition("=")
+        kind, _, metric = key.strip().rpartition(".")
+        if kind and kind not in KINDS:
+            raise ValueError(f"unknown request kind in SLO {spec!r}")
+        if metric not in SLO_MAX + SLO_MIN:
+            raise ValueError(f"unknown SLO metric {metric!r}, expected one of {list(SLO_MAX + SLO_MIN)}")
+        if kind and metric == "rss_mb":
+            raise ValueError("rss_mb is measured per worker, not per request kind")
+        out.append((kind or None, metric, float(value)))
+    return out
+
+
+def check_slo(slos, overall: Dict[str, object], by_kind: Dict[str, Dict[str, object]],
+              rss_peak_mb: Optional[float]) -> List[Dict[str, object]]:
+    results = []
+    for kind, metric, limit in slos:
+        if metric == "rss_mb":
+            value = rss_peak_mb
+        else:
+            value = (by_kind.get(kind) or {}).get(metric) if kind else overall.get(metric)
+        if value is None:
+            ok = False  # нет данных (ни одного успешного запроса / RSS недоступен) — SLO не подтверждён
+        elif metric in SLO_MIN:
+            ok = value >= limit
+        else:
+            ok = value <= limit
+        results.append({"slo": f"{kind + '.' if kind else ''}{metric}", "limit": limit, "value": value, "ok": ok})
+    return results
+
+
+def _fmt(v, spec=".0f") -> str:
+    return "-" if v is None else format(v, spec)
+
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description="Load test of a locally started server with latency SLO checks")
+    ap.add_argument("--server", choices=["serve", "uvicorn"], default="serve",
+                    help="serve.py pre-fork workers or a single uvicorn process")
+    ap.add_argument("--workers", type=int, default=2, help="serve.py workers")
+    ap.add_argument("--url", default=None, help="use an already running server instead of starting one")
+    ap.add_argument("--pid", type=int, default=None, help="server (master) pid for RSS sampling with --url")
+    ap.add_argument("--mix", default="predict=0.5,predict_second_csv=0.3,predict_second_form=0.2",
+                    help=f"request kinds with weights, from {KINDS}")
+    ap.add_argument("--concurrency", type=int, default=4, help="max requests in flight")
+    ap.add_argument("--rate", type=float, default=0.0, help="Poisson arrivals per second; 0 = closed loop")
+    ap.add_argument("--duration", type=float, default=60.0, help="seconds of load (0 = until --requests)")
+    ap.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = by --duration)")
+    ap.add_argument("--warmup", type=int, default=2, help="requests before measuring")
+    ap.add_argument("--timeout", type=float, default=300.0, help="per-request timeout, s")
+    ap.add_argument("--fits-size", default="medium", help=f"FITS set per /predict, from {list(synth.SIZES)}")
+    ap.add_argument("--targets", type=int, default=8, help="distinct FITS targets (defeats single-flight)")
+    ap.add_argument("--csv-rows", type=int, default=200)
+    ap.add_argument("--window", type=float, default=10.0, help="timeline window, s")
+    ap.add_argument("--rss-interval", type=float, default=1.0)
+    ap.add_argument("--slo", action="append", default=[],
+                    help="SLO, e.g. p95_ms=8000, predict.p99_ms=20000, error_rate=0.01, rss_mb=1500, rps=0.5")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="output JSON (default bench/results/load-<commit>.json)")
+    args = ap.parse_args(argv)
+
+    if not args.duration and not args.requests:
+        ap.error("set --duration or --requests")
+    try:
+        mix = parse_mix(args.mix)
+        slos = parse_slo(args.slo)
+    except ValueError as e:
+        ap.error(str(e))
+
+    payloads = make_payloads(args.fits_size, args.targets, args.csv_rows, args.seed)
+    proc = None
+    url, pid = args.url, args.pid
+    if url is None:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        proc = start_server(args.server, args.workers, port)
+        pid = proc.pid
+    try:
+        startup_s = wait_ready(url, proc)
+        print(f"server {url} ready in {startup_s:.1f}s; mix={mix} concurrency={args.concurrency} "
+              f"rate={args.rate or 'closed loop'} duration={args.duration}s requests={args.requests or '-'}")
+        rss = RssSampler(pid, args.rss_interval)
+        # RSS отсчитывается от того же t0, что и записи запросов (после прогрева) — окна timeline совпадают
+        records, elapsed = asyncio.run(run_load(url, payloads, mix, args.concurrency, args.rate, args.duration,
+                                                args.requests, args.warmup, args.timeout, args.seed,
+                                                on_start=rss.start))
+        rss.stop()
+    finally:
+        if proc is not None:
+            stop_server(proc)
+
+    overall = latency_stats(records, elapsed)
+    by_kind = {k: latency_stats([r for r in records if r["kind"] == k], elapsed)
+               for k in KINDS if any(r["kind"] == k for r in records)}
+    peaks = rss.worker_peaks()
+    rss_peak = max(peaks.values()) if peaks else None
+    slo_results = check_slo(slos, overall, by_kind, rss_peak)
+
+    print(f"{'kind':<20} {'req':>5} {'err%':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, v in [("all", overall)] + list(by_kind.items()):
+        print(f"{name:<20} {v['requests']:>5} {v['error_rate'] * 100:>6.1f} {v['rps']:>7.2f} "
+              f"{_fmt(v['p50_ms']):>8} {_fmt(v['p95_ms']):>8} {_fmt(v['p99_ms']):>8} {_fmt(v['max_ms']):>8}")
+    if overall["errors"]:
+        print(f"errors: {overall['errors']}")
+    if peaks:
+        print("peak RSS per worker: " + ", ".join(f"{p}={mb:.0f}MB" for p, mb in sorted(peaks.items())))
+    for r in slo_results:
+        print(f"SLO {r['slo']:<24} limit={r['limit']:<10g} value={_fmt(r['value'], '.3f'):<12} "
+              f"{'ok' if r['ok'] else 'FAIL'}")
+
+    payload: Dict[str, object] = {
+        "benchmark": "load",
+        "git": git_revision(),
+        "env": environment_meta(),
+        "params": {k: v for k, v in vars(args).items() if k != "out"},
+        "server": {"url": url, "started": proc is not None, "startup_s": startup_s},
+        "elapsed_s": elapsed,
+        "overall": overall,
+        "by_kind": by_kind,
+        "rss_peak_mb": peaks,
+        "timeline": timeline(records, rss, args.window, elapsed),
+        "slo": slo_results,
+    }
+    path = save_json(payload, args.out or default_output_path("load"))
+    print(f"saved: {path}")
+    failed = [r["slo"] for r in slo_results if not r["ok"]]
+    if failed:
+        print(f"FAIL: SLO violated: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
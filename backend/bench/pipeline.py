@@ -0,0 +1,189 @@
+# backend/bench/pipeline.py
+"""
+Воспроизводимый бенчмарк пайплайна /predict и эндпоинтов.
+
+Для каждого размера (bench.synth.SIZES) генерирует синтетический набор FITS,
+замеряет по отдельности стадии пайплайна (те же функции, что вызывает /predict),
+а затем целиком /predict и /predict_second через TestClient (in-process).
+Результат пишется в JSON (bench/results/pipeline-<commit>.json), который можно
+сравнить с результатом другого коммита через --compare.
+
+Примеры (из каталога backend):
+    python -m bench.pipeline --sizes small,medium --repeat 3
+    python -m bench.pipeline --sizes medium --compare bench/results/pipeline-abc123.json
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from bench import synth
+from bench.common import (default_output_path, environment_meta, git_revision,
+                          import_backend, save_json, time_call)
+
+STAGES = [
+    "read_fits",
+    "load_curve",
+    "process_curve",
+    "features",
+    "predict",
+    "suspicious_regions",
+    "folded_curve",
+    "transit_candidates",
+]
+
+
+def _bundle(main, endpoint: str):
+    registry = main.ARTIFACTS.current()
+    return registry.get(registry.resolve(endpoint))
+
+
+def _features_frame(flux_detr):
+    """Фрейм tsfresh с одним рядом — как в _stage_classify."""
+    return pd.DataFrame({
+        'id': 1,
+        'time': np.arange(len(flux_detr), dtype=float),
+        'flux': flux_detr
+    })
+
+
+def bench_stages(main, files, repeat: int) -> Dict[str, object]:
+    """
+    Стадии /predict — те же функции main, что вызывает _run_predict:
+     - read_fits     — только чтение FITS (read_time_flux_from_fitsbytes), для справки;
+     - load_curve    — _stage_load_curve: чтение, склейка, маска, сортировка;
+     - process_curve — _stage_process_curve: срез выбросов, ресемплинг, детренд;
+     - features      — _features_matrix: tsfresh + масштабирование;
+     - predict       — _predict_rows.
+    """
+    bundle = _bundle(main, "predict")
+    step_days, med_kernel_hours, min_points = main._preprocessing_params(bundle)
+    flux_dtype = main._flux_dtype(bundle)
+    out: Dict[str, object] = {}
+    out["read_fits"] = time_call(
+        lambda: [main.read_time_flux_from_fitsbytes(b, flux_dtype=flux_dtype) for _, b in files], repeat)
+    parts = out["read_fits"]["result"]
+
+    out["load_curve"] = time_call(lambda: main._stage_load_curve(files, min_points, flux_dtype=flux_dtype), repeat)
+    tcat, fcat, _ = out["load_curve"]["result"]
+
+    out["process_curve"] = time_call(
+        lambda: main._stage_process_curve(tcat, fcat, step_days, med_kernel_hours, min_points), repeat)
+    grid, flux_detr = out["process_curve"]["result"]
+
+    out["features"] = time_call(lambda: main._features_matrix(_features_frame(flux_detr), bundle,
+                                                              main.TSFRESH_N_JOBS), repeat)
+    X_new = out["features"]["result"]
+    out["predict"] = time_call(lambda: float(main._predict_rows(X_new, bundle)[0]), repeat)
+
+    out["suspicious_regions"] = time_call(lambda: main.detect_suspicious_regions(grid, flux_detr, num_regions=5), repeat)
+    regions = out["suspicious_regions"]["result"]
+    out["transit_candidates"] = time_call(lambda: main.detect_transit_candidates(grid, flux_detr, n_candidates=5), repeat)
+    transits = out["transit_candidates"]["result"]
+    # фолдинг по фазовым бинам сразу для всех периодов-кандидатов (как в /predict)
+    out["folded_curve"] = time_call(lambda: main.fold_candidate_periods(grid, flux_detr, regions, transits), repeat)
+
+    meta = {"n_raw_points": int(sum(len(p[0]) for p in parts)),
+            "n_clean_points": int(len(tcat)),
+            "n_grid_points": int(len(grid)),
+            "probability": out["predict"]["result"],
+            "n_fold_periods": len(out["folded_curve"]["result"]["folds"])}
+    return {"meta": meta, "stages": {k: out[k] for k in STAGES}}
+
+
+def bench_endpoints(main, files, csv_rows: int, repeat: int, seed: int) -> Dict[str, object]:
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+
+    def _predict():
+        payload = [("files", (name, data, "application/octet-stream")) for name, data in files]
+        r = client.post("/predict", files=payload)
+        if r.status_code != 200:
+            raise RuntimeError(f"/predict -> {r.status_code}: {r.text[:200]}")
+        return len(r.content)
+
+    csv_bytes = synth.make_features_csv(csv_rows, seed=seed)
+
+    def _predict_second():
+        r = client.post("/predict_second", files={"csv_file": ("bench.csv", csv_bytes, "text/csv")})
+        if r.status_code != 200:
+            raise RuntimeError(f"/predict_second -> {r.status_code}: {r.text[:200]}")
+        return len(r.content)
+
+    out = {"predict": time_call(_predict, repeat)}
+    out["predict"]["response_bytes"] = out["predict"]["result"]
+    if "predict_second" in main.ARTIFACTS.current().routes:
+        out["predict_second"] = time_call(_predict_second, repeat)
+        out["predict_second"]["response_bytes"] = out["predict_second"]["result"]
+        out["predict_second"]["csv_rows"] = csv_rows
+    return out
+
+
+def compare(current: Dict[str, object], baseline_path: str) -> List[str]:
+    """Таблица отношений median(current)/median(baseline) по стадиям и эндпоинтам."""
+    with open(baseline_path, encoding="utf-8") as fh:
+        base = json.load(fh)
+    lines = [f"baseline: {base.get('git', {}).get('commit')}  current: {current.get('git', {}).get('commit')}",
+             f"{'size':<8} {'stage':<22} {'base ms':>10} {'curr ms':>10} {'ratio':>7}"]
+    for size, cur in current["sizes"].items():
+        old = base.get("sizes", {}).get(size)
+        if not old:
+            continue
+        pairs = [(s, cur["stages"].get(s), old["stages"].get(s)) for s in cur.get("stages", {})]
+        pairs += [(f"POST /{e}", cur["endpoints"].get(e), old.get("endpoints", {}).get(e))
+                  for e in cur.get("endpoints", {})]
+        for name, c, o in pairs:
+            if not c or not o:
+                continue
+            ratio = c["median"] / o["median"] if o["median"] > 0 else float("nan")
+            lines.append(f"{size:<8} {name:<22} {o['median'] * 1e3:>10.1f} {c['median'] * 1e3:>10.1f} {ratio:>7.2f}")
+    return lines
+
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark of the /predict pipeline stages and endpoints")
+    ap.add_argument("--sizes", default="small,medium",
+                    help=f"comma-separated sizes from {list(synth.SIZES)} or quarter counts")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--csv-rows", type=int, default=500, help="rows in the /predict_second CSV")
+    ap.add_argument("--no-endpoints", action="store_true", help="time pipeline stages only")
+    ap.add_argument("--out", default=None, help="output JSON (default bench/results/pipeline-<commit>.json)")
+    ap.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    args = ap.parse_args(argv)
+
+    main = import_backend()
+    step_days, med_kernel_hours, _ = main._preprocessing_params(_bundle(main, "predict"))
+    payload: Dict[str, object] = {
+        "benchmark": "pipeline",
+        "git": git_revision(),
+        "env": environment_meta(),
+        "params": {"repeat": args.repeat, "seed": args.seed, "csv_rows": args.csv_rows,
+                   "step_days": step_days, "med_kernel_hours": med_kernel_hours},
+        "sizes": {},
+    }
+    for size in [s.strip() for s in args.sizes.split(",") if s.strip()]:
+        files = synth.make_fits_set(size, seed=args.seed)
+        entry = bench_stages(main, files, args.repeat)
+        entry["meta"]["n_files"] = len(files)
+        entry["meta"]["upload_bytes"] = int(sum(len(b) for _, b in files))
+        if not args.no_endpoints:
+            entry["endpoints"] = bench_endpoints(main, files, args.csv_rows, args.repeat, args.seed)
+        payload["sizes"][size] = entry
+        stages_ms = ", ".join(f"{k}={v['median'] * 1e3:.0f}ms" for k, v in entry["stages"].items())
+        print(f"[{size}] points={entry['meta']['n_raw_points']} grid={entry['meta']['n_grid_points']}: {stages_ms}")
+        for ep, v in entry.get("endpoints", {}).items():
+            print(f"[{size}] POST /{ep}: median={v['median'] * 1e3:.0f}ms")
+
+    path = save_json(payload, args.out or default_output_path("pipeline"))
+    print(f"saved: {path}")
+    if args.compare:
+        print("\n".join(compare(payload, args.compare)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
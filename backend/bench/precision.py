@@ -0,0 +1,144 @@
+# backend/bench/precision.py
+"""
+Компактный режим float32 против float64: пиковая память, пропускная способность и дрейф предсказания.
+
+Для каждого размера (bench.synth.SIZES) и каждой точности:
+ - пиковая память (tracemalloc) стадий с массивами кривой — чтение, склейка, ресемплинг,
+   детренд, кандидаты — и всего _run_predict вместе с JSON-ответом;
+ - время _run_predict (медиана из --repeat) -> кривых/с и сырых точек/с;
+ - дрейф float32 относительно float64: |Δ вероятности|, совпадение бинарного ответа,
+   максимальное отклонение обработанной кривой (в долях её std).
+Если |Δ вероятности| больше --max-drift, скрипт завершается с кодом 1; та же граница
+проверяется тестом tests/test_precision.py на синтетических кривых.
+
+Выигрыш по памяти небольшой: float32 — только массивы потока (сырые и на сетке). Время и сетка
+остаются float64 (BJD ~2.45e6: шаг float32 там ~0.25 сут), а пик /predict почти целиком —
+tsfresh (~66 МБ на medium), который считает во float64 при любом входе. Поток на medium —
+~0.2 МБ -> ~0.1 МБ; заметная разница только у стадий кривой на очень длинных загрузках.
+
+Примеры (из каталога backend):
+    python -m bench.precision --sizes small,medium,large
+    python -m bench.precision --sizes medium --max-drift 0.02
+"""
+import argparse
+import json
+import sys
+import tracemalloc
+from typing import Dict
+
+import numpy as np
+
+from bench import synth
+from bench.common import (default_output_path, environment_meta, git_revision,
+                          import_backend, save_json, time_call)
+
+PRECISIONS = ["float64", "float32"]
+DEFAULT_MAX_DRIFT = 0.05
+MB = 1024 * 1024
+
+
+def _with_precision(main, bundle, precision: str):
+    """Копия бандла с другой точностью (сам бандл в реестре не трогаем)."""
+    from types import SimpleNamespace
+    clone = SimpleNamespace(**vars(bundle))
+    clone.preprocessing = dict(bundle.preprocessing, precision=precision)
+    return clone
+
+
+def _peak_mb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / MB
+    finally:
+        tracemalloc.stop()
+
+
+def _curve_stages(main, files, bundle):
+    """Стадии /predict, работающие с массивами кривой (без tsfresh и модели)."""
+    step_days, med_kernel_hours, min_points = main._preprocessing_params(bundle)
+    tcat, fcat, fits_count = main._stage_load_curve(files, min_points, flux_dtype=main._flux_dtype(bundle))
+    grid, flux_detr = main._stage_process_curve(tcat, fcat, step_days, med_kernel_hours, min_points)
+    main._stage_candidates(grid, flux_detr, fits_count)
+    return grid, flux_detr
+
+
+def bench_size(main, files, repeat: int) -> Dict[str, object]:
+    registry = main.ARTIFACTS.current()
+    base = registry.get(registry.resolve("predict"))
+    n_raw = int(sum(len(main.read_time_column_from_fitsbytes(b)) for _, b in files))
+    out: Dict[str, object] = {"n_raw_points": n_raw, "precisions": {}}
+    results = {}
+    for precision in PRECISIONS:
+        bundle = _with_precision(main, base, precision)
+        timing = time_call(lambda: main._run_predict(files, bundle), repeat)
+        results[precision] = timing["result"]
+        out["precisions"][precision] = {
+            "peak_curve_stages_mb": _peak_mb(lambda: _curve_stages(main, files, bundle)),
+            "peak_predict_mb": _peak_mb(lambda: json.dumps(main._run_predict(files, bundle))),
+            "predict_s": {k: timing[k] for k in ("min", "median", "mean", "runs")},
+            "curves_per_s": 1.0 / timing["median"],
+            "raw_points_per_s": n_raw / timing["median"],
+            "probability": timing["result"]["probability"],
+        }
+
+    out["drift"] = drift(results["float64"], results["float32"])
+    return out
+
+
+def drift(r64: Dict[str, object], r32: Dict[str, object]) -> Dict[str, object]:
+    """Расхождение ответов _run_predict во float32 и float64."""
+    f64 = np.asarray(r64["processed_curve"]["flux"])
+    f32 = np.asarray(r32["processed_curve"]["flux"])
+    scale = float(np.std(f64)) or 1.0
+    return {
+        "probability_abs": abs(r32["probability"] - r64["probability"]),
+        "same_label": r32["exoplanet"] == r64["exoplanet"],
+        "processed_flux_max_abs_over_std": float(np.max(np.abs(f32 - f64)) / scale) if len(f64) == len(f32) else None,
+        "n_transit_candidates": [len(r64["transit_candidates"]), len(r32["transit_candidates"])],
+    }
+
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description="float32 compact mode vs float64: memory, throughput, prediction drift")
+    ap.add_argument("--sizes", default="small,medium,large",
+                    help=f"comma-separated sizes from {list(synth.SIZES)} or quarter counts")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--max-drift", type=float, default=DEFAULT_MAX_DRIFT,
+                    help="max allowed |p_float32 - p_float64|; exceeded -> exit code 1")
+    ap.add_argument("--out", default=None, help="output JSON (default bench/results/precision-<commit>.json)")
+    args = ap.parse_args(argv)
+
+    main = import_backend()
+    payload: Dict[str, object] = {
+        "benchmark": "precision",
+        "git": git_revision(),
+        "env": environment_meta(),
+        "params": {"repeat": args.repeat, "seed": args.seed, "max_drift": args.max_drift},
+        "sizes": {},
+    }
+    failed = []
+    for size in [s.strip() for s in args.sizes.split(",") if s.strip()]:
+        entry = bench_size(main, synth.make_fits_set(size, seed=args.seed), args.repeat)
+        payload["sizes"][size] = entry
+        for precision, v in entry["precisions"].items():
+            print(f"[{size}] {precision}: curve stages peak={v['peak_curve_stages_mb']:.1f}MB "
+                  f"predict peak={v['peak_predict_mb']:.1f}MB median={v['predict_s']['median'] * 1e3:.0f}ms "
+                  f"({v['raw_points_per_s']:.0f} raw points/s) p={v['probability']:.4f}")
+        d = entry["drift"]
+        print(f"[{size}] drift: |dp|={d['probability_abs']:.4f} same_label={d['same_label']} "
+              f"max|dflux|/std={d['processed_flux_max_abs_over_std']}")
+        if d["probability_abs"] > args.max_drift:
+            failed.append(size)
+
+    path = save_json(payload, args.out or default_output_path("precision"))
+    print(f"saved: {path}")
+    if failed:
+        print(f"FAIL: float32 probability drift above {args.max_drift} for sizes: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,139 @@
+# backend/bench/synth.py
+"""
+Генератор синтетических Kepler-подобных кривых блеска.
+Делает многоквартальные FITS (long cadence, ~29.4 мин) с:
+ - инжектированными транзитами (box),
+ - межквартальными и «downlink» разрывами,
+ - медленным трендом, скачками уровня между кварталами и выбросами (cosmic rays).
+Размер задаётся числом кварталов; всё детерминировано через seed.
+"""
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from astropy.io import fits
+
+# Параметры по умолчанию (близко к Kepler long cadence)
+CADENCE_MINUTES = 29.4244
+QUARTER_DAYS = 90.0
+QUARTER_GAP_DAYS = 1.5
+KEPLER_T0 = 131.512  # BKJD начала Q1
+
+# Пресеты размеров: имя -> число кварталов
+SIZES = {
+    "small": 1,
+    "medium": 4,
+    "large": 8,
+    "xlarge": 17,
+}
+
+
+def make_light_curve(n_quarters: int = 4,
+                     quarter_days: float = QUARTER_DAYS,
+                     cadence_minutes: float = CADENCE_MINUTES,
+                     period_days: Optional[float] = 11.3,
+                     depth_ppm: float = 800.0,
+                     duration_hours: float = 4.0,
+                     noise_ppm: float = 120.0,
+                     outlier_fraction: float = 0.002,
+                     gap_fraction: float = 0.01,
+                     seed: int = 0) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Возвращает список кварталов [(time, flux), ...].
+    flux в e-/s (SAP_FLUX-подобный), NaN на месте выброшенных каденсов.
+    period_days=None -> без транзитов.
+    """
+    rng = np.random.default_rng(seed)
+    cadence = cadence_minutes / (24.0 * 60.0)
+    n_per_quarter = int(quarter_days / cadence)
+    epoch = KEPLER_T0 + rng.uniform(0.0, period_days or 1.0)
+
+    quarters = []
+    t_start = KEPLER_T0
+    for q in range(n_quarters):
+        t = t_start + np.arange(n_per_quarter) * cadence
+        t_start = t[-1] + QUARTER_GAP_DAYS
+
+        # уровень квартала (другой модуль ПЗС) + медленный тренд
+        level = rng.uniform(2.0e4, 6.0e4)
+        span = t[-1] - t[0]
+        x = (t - t[0]) / span
+        trend = 1.0 + 0.004 * x + 0.002 * np.sin(2 * np.pi * x * rng.uniform(0.5, 2.0))
+        rel = trend + rng.normal(0.0, noise_ppm * 1e-6, size=len(t))
+
+        if period_days:
+            phase = np.mod(t - epoch + 0.5 * period_days, period_days) - 0.5 * period_days
+            in_transit = np.abs(phase) < (duration_hours / 24.0) / 2.0
+            rel[in_transit] -= depth_ppm * 1e-6
+
+        n_out = int(outlier_fraction * len(t))
+        if n_out > 0:
+            idx = rng.choice(len(t), size=n_out, replace=False)
+            rel[idx] += rng.choice([-1.0, 1.0], size=n_out) * rng.uniform(0.01, 0.05, size=n_out)
+
+        flux = rel * level
+
+        # «дырки» передачи данных: несколько сплошных кусков NaN
+        n_gap = int(gap_fraction * len(t))
+        if n_gap > 0:
+            for _ in range(3):
+                g0 = rng.integers(0, max(1, len(t) - n_gap))
+                flux[g0:g0 + n_gap // 3] = np.nan
+
+        quarters.append((t, flux))
+    return quarters
+
+
+def quarter_to_fits_bytes(time: np.ndarray, flux: np.ndarray, quarter: int = 1) -> bytes:
+    """Упаковывает квартал в FITS с LIGHTCURVE-таблицей как у Kepler."""
+    n = len(time)
+    flux_err = np.full(n, np.nanstd(flux) if np.any(np.isfinite(flux)) else 1.0, dtype=np.float32)
+    cols = [
+        fits.Column(name="TIME", format="D", unit="BJD - 2454833", array=time),
+        fits.Column(name="TIMECORR", format="E", array=np.zeros(n, dtype=np.float32)),
+        fits.Column(name="CADENCENO", format="J", array=np.arange(n, dtype=np.int32)),
+        fits.Column(name="SAP_FLUX", format="E", unit="e-/s", array=flux.astype(np.float32)),
+        fits.Column(name="SAP_FLUX_ERR", format="E", array=flux_err),
+        fits.Column(name="PDCSAP_FLUX", format="E", array=flux.astype(np.float32)),
+        fits.Column(name="SAP_QUALITY", format="J", array=np.zeros(n, dtype=np.int32)),
+    ]
+    primary = fits.PrimaryHDU()
+    primary.header["TELESCOP"] = "Kepler"
+    primary.header["QUARTER"] = quarter
+    table = fits.BinTableHDU.from_columns(cols, name="LIGHTCURVE")
+    bio = BytesIO()
+    fits.HDUList([primary, table]).writeto(bio)
+    return bio.getvalue()
+
+
+def make_fits_set(size: str = "medium", seed: int = 0, **kwargs) -> List[Tuple[str, bytes]]:
+    """
+    Набор FITS-файлов одной цели: [(filename, bytes), ...].
+    size — ключ SIZES или число кварталов строкой.
+    """
+    n_quarters = SIZES[size] if size in SIZES else int(size)
+    quarters = make_light_curve(n_quarters=n_quarters, seed=seed, **kwargs)
+    return [(f"synthetic_q{q + 1}.fits", quarter_to_fits_bytes(t, f, quarter=q + 1))
+            for q, (t, f) in enumerate(quarters)]
+
+
+def make_features_csv(n_rows: int = 100, seed: int = 0) -> bytes:
+    """CSV для /predict_second с колонками koi_* в правдоподобных диапазонах."""
+    rng = np.random.default_rng(seed)
+    cols: Dict[str, np.ndarray] = {
+        "koi_period": rng.uniform(0.5, 400.0, n_rows),
+        "koi_time0bk": rng.uniform(131.0, 600.0, n_rows),
+        "koi_duration": rng.uniform(1.0, 12.0, n_rows),
+        "koi_depth": rng.uniform(50.0, 20000.0, n_rows),
+        "koi_prad": rng.uniform(0.5, 20.0, n_rows),
+        "koi_teq": rng.uniform(200.0, 2500.0, n_rows),
+        "koi_insol": rng.uniform(0.1, 5000.0, n_rows),
+        "koi_tce_plnt_num": rng.integers(1, 4, n_rows).astype(float),
+        "koi_steff": rng.uniform(3500.0, 7000.0, n_rows),
+        "koi_slogg": rng.uniform(3.8, 4.8, n_rows),
+        "koi_srad": rng.uniform(0.5, 2.5, n_rows),
+        "koi_kepmag": rng.uniform(9.0, 16.0, n_rows),
+    }
+    header = ",".join(cols.keys())
+    rows = [",".join(f"{cols[k][i]:.6g}" for k in cols) for i in range(n_rows)]
+    return ("\n".join([header] + rows) + "\n").encode("utf-8")
@@ -0,0 +1,314 @@
+# backend/catalog.py
+"""
+Локальный каталог планет (Kepler cumulative + TESS toi) для /catalog/* эндпоинтов.
+
+Снимок таблиц хранится колоночно в одном файле catalog_snapshot.npz (numpy-массивы,
+без pickle) и загружается один раз. При загрузке строятся индексы:
+ - поиск по имени: триграммный индекс (подстрока, как `includes` на фронте);
+ - категориальные фильтры (mission, disposition, planet_type): значение -> номера строк;
+ - числовые диапазоны (koi_period, koi_prad, ...): argsort + searchsorted.
+
+Снимок собирается отдельно (нужен интернет или заранее скачанные JSON):
+    python catalog.py snapshot                          # скачать из NASA Exoplanet Archive
+    python catalog.py snapshot --kepler k.json --tess t.json   # из локальных файлов
+    python catalog.py snapshot --confirmed-only         # компактный снимок для репозитория
+
+Снимок по умолчанию лежит рядом с модулем (backend/catalog_snapshot.npz) и коммитится в
+репозиторий: --confirmed-only оставляет только то, что показывает страница каталога
+(Kepler CONFIRMED, TESS CP/KP), — это несколько тысяч строк и сотни КБ.
+Если снимка нет, используется маленькая выборка catalog_fallback.json (известные
+подтверждённые планеты, приближённые значения) — в meta у неё "sample": true.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.request import urlopen
+
+import numpy as np
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+# относительный путь — от каталога модуля, а не от текущего каталога процесса
+CATALOG_SNAPSHOT_PATH = os.path.join(_HERE, os.environ.get("EXO_CATALOG_SNAPSHOT", "catalog_snapshot.npz"))
+CATALOG_FALLBACK_PATH = os.path.join(_HERE, "catalog_fallback.json")
+
+ARCHIVE_API = "https://exoplanetarchive.ipac.caltech.edu/cgi-bin/nstedAPI/nph-nstedAPI"
+KEPLER_SELECT = ("kepid,kepoi_name,kepler_name,koi_disposition,koi_period,koi_time0bk,koi_duration,koi_depth,"
+                 "koi_prad,koi_teq,koi_insol,koi_tce_plnt_num,koi_steff,koi_slogg,koi_srad,koi_kepmag")
+TESS_SELECT = ("toi,tid,tfopwg_disp,pl_orbper,pl_tranmid,pl_trandurh,pl_trandep,pl_rade,pl_eqt,pl_insol,"
+               "pl_pnum,st_teff,st_logg,st_rad,st_tmag")
+
+# числовые колонки снимка (имена как у признаков модели v2); TESS-колонки сводятся к ним же
+NUMERIC_COLS = [
+    "koi_period", "koi_time0bk", "koi_duration", "koi_depth", "koi_prad", "koi_teq",
+    "koi_insol", "koi_tce_plnt_num", "koi_steff", "koi_slogg", "koi_srad", "koi_kepmag",
+]
+TESS_TO_KOI = {
+    "pl_orbper": "koi_period", "pl_tranmid": "koi_time0bk", "pl_trandurh": "koi_duration",
+    "pl_trandep": "koi_depth", "pl_rade": "koi_prad", "pl_eqt": "koi_teq", "pl_insol": "koi_insol",
+    "pl_pnum": "koi_tce_plnt_num", "st_teff": "koi_steff", "st_logg": "koi_slogg",
+    "st_rad": "koi_srad", "st_tmag": "koi_kepmag",
+}
+TEXT_COLS = ["id", "name", "mission", "disposition", "planet_type"]
+CATEGORICAL_COLS = ["mission", "disposition", "planet_type"]
+# подтверждённые планеты (как фильтрует страница каталога): Kepler koi_disposition, TESS tfopwg_disp
+KEPLER_CONFIRMED = ("CONFIRMED",)
+TESS_CONFIRMED = ("CP", "KP")
+
+MAX_PAGE_SIZE = 200
+
+
+def planet_type_from_radius(radius: float) -> str:
+    """Те же границы, что и на фронте (CatalogPage)."""
+    if not np.isfinite(radius) or radius <= 0:
+        return "Unknown"
+    if radius < 1.6:
+        return "Terrestrial"
+    if radius < 4:
+        return "Superearth"
+    if radius < 10:
+        return "Neptune-like"
+    return "Gas giant"
+
+
+# -------------------------
+# Сборка снимка
+# -------------------------
+def _fetch_json(table: str, select: str) -> List[dict]:
+    url = f"{ARCHIVE_API}?table={table}&select={select}&format=json"
+    with urlopen(url, timeout=120) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def _num(v) -> float:
+    try:
+        return float(v) if v is not None and v != "" else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _snapshot_arrays(kepler_rows: List[dict], tess_rows: List[dict],
+                     sources: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Нормализует обе таблицы к общей схеме: колонки-массивы + meta."""
+    cols: Dict[str, list] = {c: [] for c in TEXT_COLS + NUMERIC_COLS}
+    for i, d in enumerate(kepler_rows):
+        cols["id"].append(f"kepler-{d.get('kepoi_name') or i}")
+        cols["name"].append(d.get("kepler_name") or f"Kepid {d.get('kepid')}")
+        cols["mission"].append("Kepler")
+        cols["disposition"].append(d.get("koi_disposition") or "")
+        for c in NUMERIC_COLS:
+            cols[c].append(_num(d.get(c)))
+    for i, d in enumerate(tess_rows):
+        cols["id"].append(f"tess-{d.get('toi') or i}")
+        cols["name"].append(f"TID {d.get('tid')}")
+        cols["mission"].append("TESS")
+        cols["disposition"].append(d.get("tfopwg_disp") or "")
+        for src, c in TESS_TO_KOI.items():
+            cols[c].append(_num(d.get(src)))
+    cols["planet_type"] = [planet_type_from_radius(r) for r in cols["koi_prad"]]
+
+    arrays = {c: np.array(cols[c], dtype=str) for c in TEXT_COLS}
+    arrays.update({c: np.array(cols[c], dtype=np.float64) for c in NUMERIC_COLS})
+    meta = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "rows": {"Kepler": len(kepler_rows), "TESS": len(tess_rows)},
+        "sources": sources or {},
+    }
+    return arrays, meta
+
+
+def build_snapshot(kepler_rows: List[dict], tess_rows: List[dict], path: str,
+                   sources: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Пишет колоночный .npz из строк обеих таблиц."""
+    arrays, meta = _snapshot_arrays(kepler_rows, tess_rows, sources)
+    arrays["__meta__"] = np.array(json.dumps(meta))
+    np.savez_compressed(path, **arrays)
+    return meta
+
+
+# -------------------------
+# Индекс и запросы
+# -------------------------
+def _trigrams(s: str) -> List[str]:
+    return [s[i:i + 3] for i in range(len(s) - 2)]
+
+
+class CatalogIndex:
+    """Снимок каталога в памяти + индексы. Иммутабелен после загрузки."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any], version: str):
+        self.meta = meta
+        self.version = version
+        self.text = {c: arrays[c] for c in TEXT_COLS}
+        self.numeric = {c: arrays[c] for c in NUMERIC_COLS}
+        self.n = len(self.text["id"])
+
+        # имена: lower-case + триграммы -> отсортированные номера строк
+        self.names_lower = np.char.lower(self.text["name"])
+        postings: Dict[str, List[int]] = {}
+        for row, name in enumerate(self.names_lower.tolist()):
+            for tg in set(_trigrams(name)):
+                postings.setdefault(tg, []).append(row)
+        self.trigram_index = {tg: np.array(rows, dtype=np.int32) for tg, rows in postings.items()}
+
+        # категориальные колонки: значение -> номера строк
+        self.categorical = {}
+        for c in CATEGORICAL_COLS:
+            values, inverse = np.unique(self.text[c], return_inverse=True)
+            self.categorical[c] = {str(v): np.flatnonzero(inverse == k) for k, v in enumerate(values)}
+
+        # числовые колонки: порядок сортировки (NaN в конце) и отсортированные значения без NaN
+        self.sorted_order = {}
+        self.sorted_values = {}
+        for c, vals in self.numeric.items():
+            order = np.argsort(vals, kind="stable")
+            finite = int(np.isfinite(vals).sum())
+            self.sorted_order[c] = order
+            self.sorted_values[c] = vals[order[:finite]]
+
+    @classmethod
+    def load(cls, path: str) -> "CatalogIndex":
+        with open(path, "rb") as fh:
+            version = hashlib.sha1(fh.read()).hexdigest()[:16]
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+        meta = json.loads(str(arrays.pop("__meta__"))) if "__meta__" in arrays else {}
+        return cls(arrays, meta, version)
+
+    @classmethod
+    def load_fallback(cls, path: str = CATALOG_FALLBACK_PATH) -> "CatalogIndex":
+        """Выборка из репозитория: {"kepler": [...], "tess": [...]} в формате строк архива."""
+        with open(path, "rb") as fh:
+            raw = fh.read()
+        doc = json.loads(raw.decode("utf-8"))
+        arrays, meta = _snapshot_arrays(doc.get("kepler", []), doc.get("tess", []),
+                                        {"fallback": os.path.basename(path)})
+        meta["created_at"] = doc.get("created_at", "")
+        meta["sample"] = True
+        return cls(arrays, meta, "sample-" + hashlib.sha1(raw).hexdigest()[:9])
+
+    # ---- маски фильтров ----
+    def _ids_mask(self, ids: np.ndarray) -> np.ndarray:
+        m = np.zeros(self.n, dtype=bool)
+        m[ids] = True
+        return m
+
+    def _name_mask(self, term: str) -> np.ndarray:
+        term = term.lower().strip()
+        if len(term) < 3:
+            return np.char.find(self.names_lower, term) >= 0
+        candidates = None
+        for tg in set(_trigrams(term)):
+            rows = self.trigram_index.get(tg)
+            if rows is None:
+                return np.zeros(self.n, dtype=bool)
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+            if len(candidates) == 0:
+                return np.zeros(self.n, dtype=bool)
+        # триграммы дают кандидатов; подстроку проверяем только на них
+        hits = candidates[np.char.find(self.names_lower[candidates], term) >= 0]
+        return self._ids_mask(hits)
+
+    def _range_mask(self, col: str, lo: Optional[float], hi: Optional[float]) -> np.ndarray:
+        vals = self.sorted_values[col]
+        i = 0 if lo is None else int(np.searchsorted(vals, lo, side="left"))
+        j = len(vals) if hi is None else int(np.searchsorted(vals, hi, side="right"))
+        return self._ids_mask(self.sorted_order[col][i:max(i, j)])
+
+    def query(self, q: Optional[str] = None, filters: Optional[Dict[str, Sequence[str]]] = None,
+              ranges: Optional[Dict[str, tuple]] = None, sort: Optional[str] = None,
+              page: int = 0, page_size: int = 24) -> Dict[str, Any]:
+        mask = np.ones(self.n, dtype=bool)
+        if q:
+            mask &= self._name_mask(q)
+        for col, values in (filters or {}).items():
+            index = self.categorical[col]
+            rows = [index[v] for v in values if v in index]
+            mask &= self._ids_mask(np.concatenate(rows)) if rows else False
+        for col, (lo, hi) in (ranges or {}).items():
+            mask &= self._range_mask(col, lo, hi)
+
+        if sort:
+            desc = sort.startswith("-")
+            order = self.sorted_order[sort.lstrip("-")]
+            if desc:
+                # по убыванию, но NaN всё равно в конце
+                col = self.numeric[sort.lstrip("-")]
+                finite = int(np.isfinite(col).sum())
+                order = np.concatenate([order[:finite][::-1], order[finite:]])
+            rows = order[mask[order]]
+        else:
+            rows = np.flatnonzero(mask)
+
+        page_size = max(1, min(MAX_PAGE_SIZE, int(page_size)))
+        total = int(len(rows))
+        page = max(0, int(page))
+        chunk = rows[page * page_size:(page + 1) * page_size]
+        return {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "page_count": (total + page_size - 1) // page_size,
+            "items": [self.row(int(r)) for r in chunk],
+        }
+
+    def row(self, r: int) -> Dict[str, Any]:
+        item: Dict[str, Any] = {c: str(self.text[c][r]) for c in TEXT_COLS}
+        for c in NUMERIC_COLS:
+            v = float(self.numeric[c][r])
+            item[c] = v if np.isfinite(v) else None
+        return item
+
+    def describe(self) -> Dict[str, Any]:
+        """Фасеты (значение -> количество) и диапазоны числовых колонок — для фильтров на фронте."""
+        return {
+            "version": self.version,
+            "rows": self.n,
+            "meta": self.meta,
+            "facets": {c: {v: int(len(ids)) for v, ids in idx.items()} for c, idx in self.categorical.items()},
+            "ranges": {c: ([float(v[0]), float(v[-1])] if len(v) else None) for c, v in self.sorted_values.items()},
+        }
+
+
+def main_cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Build the local catalog snapshot (Kepler cumulative + TESS toi)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("snapshot")
+    sp.add_argument("--kepler", help="local JSON of the cumulative table (otherwise downloaded)")
+    sp.add_argument("--tess", help="local JSON of the toi table (otherwise downloaded)")
+    sp.add_argument("--out", default=CATALOG_SNAPSHOT_PATH)
+    sp.add_argument("--confirmed-only", action="store_true",
+                    help="keep only confirmed planets (what the catalog page shows): compact snapshot to commit")
+    args = ap.parse_args(argv)
+
+    sources = {}
+    if args.kepler:
+        with open(args.kepler, encoding="utf-8") as fh:
+            kepler = json.load(fh)
+        sources["kepler"] = os.path.basename(args.kepler)
+    else:
+        kepler = _fetch_json("cumulative", KEPLER_SELECT)
+        sources["kepler"] = f"{ARCHIVE_API}?table=cumulative"
+    if args.tess:
+        with open(args.tess, encoding="utf-8") as fh:
+            tess = json.load(fh)
+        sources["tess"] = os.path.basename(args.tess)
+    else:
+        tess = _fetch_json("toi", TESS_SELECT)
+        sources["tess"] = f"{ARCHIVE_API}?table=toi"
+
+    if args.confirmed_only:
+        kepler = [d for d in kepler if d.get("koi_disposition") in KEPLER_CONFIRMED]
+        tess = [d for d in tess if d.get("tfopwg_disp") in TESS_CONFIRMED]
+        sources["filter"] = "confirmed-only"
+
+    meta = build_snapshot(kepler, tess, args.out, sources)
+    print(f"saved {args.out}: {meta['rows']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -16,13 +16,12 @@ import re
 import unicodedata
 from fastapi import HTTPException
 from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from scipy.signal import find_peaks, peak_widths
 from scipy.stats import median_abs_deviation
 import numpy as np
 import pandas as pd
-import joblib
 import lightgbm as lgb
 from astropy.io import fits
 from io import BytesIO
@@ -33,76 +32,63 @@ from scipy.signal import medfilt, savgol_filter
 from tsfresh import extract_features
 from tsfresh.feature_extraction import EfficientFCParameters
 from fastapi import Form
+from fastapi import Header
 from io import StringIO
+import hmac
+import json
+from types import SimpleNamespace
+from time import perf_counter
+from tsfresh.feature_extraction import MinimalFCParameters, ComprehensiveFCParameters
+from starlette.concurrency import run_in_threadpool
+from artifacts import ArtifactStore
+from singleflight import SingleFlight, content_key
+from catalog import CatalogIndex, CATALOG_FALLBACK_PATH, CATALOG_SNAPSHOT_PATH, CATEGORICAL_COLS, NUMERIC_COLS as CATALOG_NUMERIC_COLS
+import hashlib
+from registry import ModelRegistry, UnknownModelError, STATS as MODEL_STATS
+from admission import AdmissionController, AdmissionRejected, AdmissionTimeout, CostEstimate, estimate_cost
+from profiling import ProfileStore, SamplingProfiler
 
 # -------------------------
-# Конфигурация / пути к артефактам модели
+# Конфигурация / манифест моделей
 # -------------------------
-MODEL_PATH = "lgb_model.txt"
-SCALER_PATH = "scaler.pkl"
-FEATURE_COLS_PATH = "feature_cols.pkl"
-BINARY_COLS_PATH = "binary_cols.pkl"
-CONTINOUS_COLS_PATH = "continouos_cols.pkl"
-BEST_THRESHOLD_PATH = "best_threshold.pkl"
-
-# Параметры предобработки
+# Пути к артефактам, пороги и параметры предобработки каждой версии — в манифесте (см. registry.py)
+MODELS_MANIFEST = os.environ.get("EXO_MODELS_MANIFEST", "models.json")
+
+# Параметры предобработки по умолчанию (бандл может переопределить в "preprocessing")
 STEP_DAYS = 1.0 / 24.0
 MED_KERNEL_HOURS = 25
 MIN_POINTS_AFTER_CLEAN = 50
 TSFRESH_PARAMS = EfficientFCParameters()
 TSFRESH_N_JOBS = 1
+# Число воркеров на машине (serve.py выставляет EXO_WORKERS до импорта main): ядра делятся между ними
+WORKERS = max(1, int(os.environ.get("EXO_WORKERS", 1)))
+# Режим mode=segments: по ряду tsfresh на квартал, ряды считаются параллельно — на доле ядер воркера,
+# иначе N воркеров запускали бы N x cpu процессов; admission учитывает их как jobs слотов
+TSFRESH_SEGMENT_N_JOBS = int(os.environ.get("EXO_TSFRESH_SEGMENT_JOBS",
+                                            max(1, (os.cpu_count() or 1) // WORKERS)))
+SEGMENT_GAP_DAYS = 5.0
+PREDICT_MODES = ("full", "segments")
+TSFRESH_PRESETS = {
+    "minimal": MinimalFCParameters,
+    "efficient": EfficientFCParameters,
+    "comprehensive": ComprehensiveFCParameters,
+}
+# Точность массивов потока: "float64" (как при обучении) или "float32" — компактный режим,
+# вдвое меньше памяти на поток; время и сетка всегда float64 (точность BJD). Бандл может задать "precision".
+# Пик /predict это почти не меняет: его задаёт tsfresh, который считает во float64 (см. bench/precision.py).
+PRECISION = os.environ.get("EXO_PRECISION", "float64")
+FLUX_DTYPES = {"float64": np.float64, "float32": np.float32}
+
+# Фолдинг: число фазовых бинов и максимум периодов-кандидатов в ответе
+FOLD_BINS = int(os.environ.get("EXO_FOLD_BINS", 200))
+FOLD_MAX_PERIODS = 6
 
 # CORS origins
 FRONTEND_ORIGINS = ["http://localhost:3000"]
 
+# Токен для /admin/* (hot reload и т.п.). Не задан -> админ-эндпоинты выключены.
+ADMIN_TOKEN = os.environ.get("EXO_ADMIN_TOKEN")
 
-MODEL2_PATH = "lgb_model_v2.txt"     # или 'model_v2.pkl' если sklearn
-SCALER2_PATH = "scaler_v2.pkl"
-IMPUTER2_PATH = "imputer_v2.pkl"
-FEATURE_COLS2_PATH = "feature_cols_v2.pkl"
-BEST_THRESHOLD2_PATH = "best_threshold_v2.pkl"
-# ---------------------------
-
-# попытка загрузить артефакты v2 (не падаем, если их нет)
-def load_artifacts_v2():
-    if not os.path.exists(MODEL2_PATH):
-        raise RuntimeError(f"Model v2 file not found: {MODEL2_PATH}")
-    if not os.path.exists(SCALER2_PATH):
-        raise RuntimeError(f"Scaler v2 file not found: {SCALER2_PATH}")
-    if not os.path.exists(IMPUTER2_PATH):
-        raise RuntimeError(f"Imputer v2 file not found: {IMPUTER2_PATH}")
-    if not os.path.exists(FEATURE_COLS2_PATH):
-        raise RuntimeError(f"Feature cols v2 file not found: {FEATURE_COLS2_PATH}")
-
-    # model: try LightGBM booster first, else joblib.load
-    try:
-        model2 = lgb.Booster(model_file=MODEL2_PATH)
-    except Exception:
-        try:
-            model2 = joblib.load(MODEL2_PATH)
-        except Exception as e:
-            raise RuntimeError(f"Cannot load model v2: {e}")
-
-    scaler2 = joblib.load(SCALER2_PATH)
-    imputer2 = joblib.load(IMPUTER2_PATH)
-    feature_cols2 = joblib.load(FEATURE_COLS2_PATH)
-
-    best_threshold2 = 0.5
-    if os.path.exists(BEST_THRESHOLD2_PATH):
-        try:
-            best_threshold2 = joblib.load(BEST_THRESHOLD2_PATH)
-        except Exception:
-            best_threshold2 = 0.5
-
-    return model2, scaler2, imputer2, feature_cols2, best_threshold2
-
-# глобальные переменные (попробуем загрузить при старте)
-try:
-    model2, scaler2, imputer2, FEATURE_COLS2, BEST_THRESHOLD2 = load_artifacts_v2()
-    print("Model v2 loaded.")
-except Exception as e:
-    model2 = scaler2 = imputer2 = FEATURE_COLS2 = BEST_THRESHOLD2 = None
-    print(f"Model v2 not loaded: {e}")
 
 # Ожидаемые ключи пользовательских полей (человеческие имена можно формировать фронтом)
 REQUIRED_FIELDS_V2 = ["koi_time0bk", "koi_duration"]
@@ -171,13 +157,13 @@ def _map_csv_to_features_v2(df: pd.DataFrame, feature_cols: List[str]) -> pd.Dat
 
     return out
 
-def _prepare_and_predict_v2(df_features: pd.DataFrame):
+def _prepare_and_predict_v2(df_features: pd.DataFrame, bundle: SimpleNamespace):
     """
     df_features: DataFrame с колонками, сопоставимыми к FEATURE_COLS2 (после _map_csv_to_features_v2)
+    bundle: бандл kind="features" из реестра, взятый в начале запроса
     Возвращает список результатов
     """
-    if model2 is None or imputer2 is None or scaler2 is None or FEATURE_COLS2 is None:
-        raise RuntimeError("Model v2 artifacts not loaded")
+    model2, scaler2, imputer2 = bundle.model, bundle.scaler, bundle.imputer
 
     # заполним пропуски через imputer (импутер ожидает 2D)
     try:
@@ -193,7 +179,7 @@ def _prepare_and_predict_v2(df_features: pd.DataFrame):
         X_scaled = X_imp
 
     # final X: reindex по FEATURE_COLS2 (чтобы порядок совпадал)
-    X_final = X_scaled.reindex(columns=FEATURE_COLS2, fill_value=0.0)
+    X_final = X_scaled.reindex(columns=bundle.feature_cols, fill_value=0.0)
 
     # predict
     try:
@@ -209,7 +195,7 @@ def _prepare_and_predict_v2(df_features: pd.DataFrame):
         results.append({
             "index": int(i),
             "probability": float(p),
-            "exoplanet": bool(p > BEST_THRESHOLD2),
+            "exoplanet": bool(p > bundle.threshold),
             "features": {col: (None if pd.isna(df_features.iloc[i][col]) else float(df_features.iloc[i][col])) for col in df_features.columns}
         })
     return results
@@ -307,34 +293,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def load_artifacts():
-    if not os.path.exists(MODEL_PATH):
-        raise RuntimeError(f"Model file not found: {MODEL_PATH}")
-    if not os.path.exists(SCALER_PATH):
-        raise RuntimeError(f"Scaler file not found: {SCALER_PATH}")
-    if not os.path.exists(FEATURE_COLS_PATH):
-        raise RuntimeError(f"Feature columns file not found: {FEATURE_COLS_PATH}")
-    if not os.path.exists(BINARY_COLS_PATH):
-        raise RuntimeError(f"Binary cols file not found: {BINARY_COLS_PATH}")
-    if not os.path.exists(CONTINOUS_COLS_PATH):
-        raise RuntimeError(f"Continous cols file not found: {CONTINOUS_COLS_PATH}")
-
-    model = lgb.Booster(model_file=MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-    feature_cols = joblib.load(FEATURE_COLS_PATH)
-    binary_cols = joblib.load(BINARY_COLS_PATH)
-    continouos_cols = joblib.load(CONTINOUS_COLS_PATH)
-
-    best_threshold = 0.5
-    if os.path.exists(BEST_THRESHOLD_PATH):
-        try:
-            best_threshold = joblib.load(BEST_THRESHOLD_PATH)
-        except Exception:
-            best_threshold = 0.5
+# Реестр моделей загружается один раз при импорте (в pre-fork режиме — в master-процессе, см. serve.py).
+# Запросы берут ссылку ARTIFACTS.current() в начале, поэтому reload подменяет реестр целиком
+# и не смешивает старые и новые файлы в одном запросе.
+ARTIFACTS = ArtifactStore(lambda: ModelRegistry.from_manifest(MODELS_MANIFEST),
+                          paths=lambda: ModelRegistry.manifest_files(MODELS_MANIFEST))
+ARTIFACTS.load()
+
 
-    return model, scaler, feature_cols, binary_cols, continouos_cols, best_threshold
+# Дедупликация одинаковых одновременных /predict (в пределах воркера)
+SINGLE_FLIGHT = SingleFlight()
 
-model, scaler, FEATURE_COLS, BINARY_COLS, CONTINOUS_COLS, BEST_THRESHOLD = load_artifacts()
+# Одновременные загрузки одного бандла с диска (промах LRU) — одна загрузка на всех
+BUNDLE_LOADS = SingleFlight()
+
+# Бюджет памяти/CPU для /predict (см. admission.py; лимиты — переменные окружения EXO_ADMISSION_*)
+ADMISSION = AdmissionController()
+
+# Профили запросов с X-Profile: 1 (только админ), последние EXO_PROFILE_RETAIN штук на диске
+PROFILES = ProfileStore()
+
+
+async def _resolve_bundle(endpoint: str, version: Optional[str] = None,
+                          routing_key: Optional[str] = None) -> SimpleNamespace:
+    """
+    Бандл для запроса: ?model=<name> или доля трафика из манифеста.
+    Не загруженный (вытеснен из LRU) бандл грузится с диска в threadpool, а не в event loop;
+    одновременные запросы к одному бандлу ждут одну загрузку (BUNDLE_LOADS).
+    """
+    registry = ARTIFACTS.current()
+    try:
+        name = registry.resolve(endpoint, version=version, routing_key=routing_key)
+    except UnknownModelError:
+        raise HTTPException(status_code=404, detail=f"Unknown model for /{endpoint}: {version}")
+    bundle = registry.peek(name)
+    if bundle is not None:
+        return bundle
+    try:
+        # id(registry): после reload тот же бандл нового реестра — отдельная загрузка
+        return await BUNDLE_LOADS.do(content_key("bundle", id(registry), name),
+                                     lambda: run_in_threadpool(registry.get, name))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model {name} not loaded on server: {e}")
+
+
+def _tsfresh_params(bundle: SimpleNamespace):
+    preset = bundle.preprocessing.get("tsfresh")
+    return TSFRESH_PRESETS[preset]() if preset in TSFRESH_PRESETS else TSFRESH_PARAMS
 
 # -------------------------
 # Утилиты для чтения FITS и предобработки
@@ -369,10 +374,10 @@ def _find_time_and_flux_in_hdu(hdu) -> Tuple[Optional[str], Optional[str]]:
     return time_col, flux_col
 
 
-def read_time_flux_from_fitsbytes(fbytes: bytes) -> Tuple[np.ndarray, np.ndarray]:
+def read_time_flux_from_fitsbytes(fbytes: bytes, flux_dtype=np.float64) -> Tuple[np.ndarray, np.ndarray]:
     """
     Открывает FITS из байтового объекта, находит таблицу с TIME и FLUX,
-    возвращает два numpy массива (time, flux).
+    возвращает два numpy массива (time float64, flux в flux_dtype).
     """
     bio = BytesIO(fbytes)
     with fits.open(bio, memmap=False) as hdul:
@@ -399,10 +404,31 @@ def read_time_flux_from_fitsbytes(fbytes: bytes) -> Tuple[np.ndarray, np.ndarray
             raise ValueError(f"Cannot find TIME/FLUX columns. Available: {available}")
 
         data = table_hdu.data
-        time = np.array(data[tcol]).astype(float)
-        flux = np.array(data[fcol]).astype(float)
+        time = np.array(data[tcol], dtype=np.float64)
+        flux = np.array(data[fcol], dtype=flux_dtype)
         return time, flux
 
+def read_time_column_from_fitsbytes(fbytes: bytes) -> np.ndarray:
+    """
+    Только колонка TIME — для предварительной оценки стоимости запроса.
+    Таблица не читается: смещение колонки берём из заголовка и смотрим прямо в байты
+    загрузки (strided view без копии). Колонки со scale/zero или векторные — ValueError.
+    """
+    with fits.open(BytesIO(fbytes), memmap=False, lazy_load_hdus=True) as hdul:
+        for i, h in enumerate(hdul):
+            if not isinstance(h, fits.BinTableHDU) or not h.header.get('NAXIS2'):
+                continue
+            tcol, _ = _find_time_and_flux_in_hdu(h)
+            if tcol is None:
+                continue
+            col = h.columns[tcol]
+            dtype, offset = h.columns.dtype.fields[tcol][:2]
+            if dtype.shape or col.bscale not in (None, 1) or col.bzero not in (None, 0):
+                raise ValueError(f"TIME column {tcol} needs full read")
+            return np.ndarray(shape=(int(h.header['NAXIS2']),), dtype=dtype.newbyteorder('>'), buffer=fbytes,
+                              offset=hdul.fileinfo(i)['datLoc'] + offset, strides=(int(h.header['NAXIS1']),))
+    raise ValueError("No table HDU with TIME column found in FITS")
+
 def _safe_kernel(k):
     """Гарантирует нечётность и минимум 3."""
     k = int(max(3, int(k)))
@@ -417,6 +443,7 @@ def resample_to_1h_and_detrend(t: np.ndarray, f: np.ndarray,
     1) Ресемплим в 1-часовые боксы
     2) Интерполируем пропуски
     3) Детренд медианным фильтром
+    Поток на сетке — в dtype входного f (float32 остаётся float32), сетка времени — float64.
     """
     if t is None or f is None or len(t) < 3:
         return None, None
@@ -424,8 +451,10 @@ def resample_to_1h_and_detrend(t: np.ndarray, f: np.ndarray,
     mask = np.isfinite(t) & np.isfinite(f)
     if not np.any(mask):
         return None, None
-    t = t[mask]
-    f = f[mask]
+    if not mask.all():
+        t = t[mask]
+        f = f[mask]
+    del mask
 
     if len(t) < 3:
         return None, None
@@ -440,23 +469,30 @@ def resample_to_1h_and_detrend(t: np.ndarray, f: np.ndarray,
     valid = (inds >= 0) & (inds < len(grid))
     if not np.any(valid):
         return None, None
-    inds_valid = inds[valid]
-    f_valid = f[valid].astype(float)
-
-    flux_grid = np.full(len(grid), np.nan, dtype=float)
-    unique_inds = np.unique(inds_valid)
-    for i in unique_inds:
-        mask_i = inds_valid == i
-        flux_grid[i] = np.sum(f_valid[mask_i])
-
-    nan_mask = np.isnan(flux_grid)
+    if not valid.all():
+        inds = inds[valid]
+        f = f[valid]
+    flux_dtype = f.dtype if f.dtype == np.float32 else np.float64
+
+    # сумма потока по боксам одним проходом, пустые боксы -> интерполяция ниже
+    counts = np.bincount(inds, minlength=len(grid))
+    if flux_dtype == np.float32:
+        # сразу в буфер float32 (bincount дал бы ещё и временный float64 на всю сетку)
+        flux_grid = np.zeros(len(grid), dtype=np.float32)
+        np.add.at(flux_grid, inds, f)
+    else:
+        flux_grid = np.bincount(inds, weights=f, minlength=len(grid))
+    del inds
+    nan_mask = counts == 0
+    del counts
     if nan_mask.all():
         return None, None
 
-    idx = np.arange(len(grid))
-    notnan = ~nan_mask
     if nan_mask.any():
-        flux_grid[nan_mask] = np.interp(idx[nan_mask], idx[notnan], flux_grid[notnan])
+        gaps = np.flatnonzero(nan_mask)
+        filled = np.flatnonzero(~nan_mask)
+        flux_grid[gaps] = np.interp(gaps, filled, flux_grid[filled])
+        del gaps, filled
 
     kernel = _safe_kernel(med_kernel_hours)
     if kernel >= len(flux_grid):
@@ -469,7 +505,8 @@ def resample_to_1h_and_detrend(t: np.ndarray, f: np.ndarray,
             wl = max(3, len(flux_grid) - (1 - (len(flux_grid) % 2)))
         trend = savgol_filter(flux_grid, window_length=wl, polyorder=2, mode='nearest')
 
-    flux_detr = flux_grid - trend
+    # детренд на месте: буфер flux_grid становится flux_detr
+    flux_detr = np.subtract(flux_grid, trend, out=flux_grid)
     return grid, flux_detr
 
 def clean_column_name(col: str) -> str:
@@ -493,16 +530,15 @@ def detect_suspicious_regions(time: np.ndarray, flux: np.ndarray,
     flux_std = np.std(flux)
     window_size = max(5, len(flux) // 100)
     
-    anomaly_scores = []
+    # массив того же dtype, что и поток (вместо списка Python-скаляров)
+    anomaly_scores = np.empty(len(flux), dtype=flux.dtype if flux.dtype == np.float32 else np.float64)
     for i in range(len(flux)):
         start = max(0, i - window_size // 2)
         end = min(len(flux), i + window_size // 2)
         window = flux[start:end]
         window_median = np.median(window)
-        score = flux_median - window_median
-        anomaly_scores.append(score)
-    
-    anomaly_scores = np.array(anomaly_scores)
+        anomaly_scores[i] = flux_median - window_median
+
     threshold = flux_std * 1.5
     candidates = []
     
@@ -614,6 +650,126 @@ def calculate_folded_curve(time: np.ndarray, flux: np.ndarray,
         'period': float(period)
     }
 
+def fold_phase_binned(time: np.ndarray, flux: np.ndarray, periods, epochs=None,
+                      n_bins: int = FOLD_BINS) -> dict:
+    """
+    Фолдинг сразу на нескольких периодах с биннингом по фазе: медиана, среднее и число точек в бине.
+
+    Все периоды обрабатываются одним векторным проходом: фазы — матрица (периоды x точки),
+    ключ бина = номер периода * n_bins + номер бина. Среднее и count — bincount, O(n).
+    Для медианы точки один раз упорядочиваются по потоку (общий порядок для всех периодов),
+    затем стабильная сортировка по ключу бина (radix для 16-битных ключей) группирует их по бинам,
+    сохраняя порядок по потоку внутри бина — медиана берётся по индексу, без сортировки в каждом бине.
+    Размер результата — periods x n_bins, от числа каденсов не зависит.
+    Фаза 0 — эпоха периода (по умолчанию первая точка кривой); пустые бины -> None.
+    """
+    periods = np.asarray(periods, dtype=np.float64).reshape(-1)
+    n_bins = int(max(4, n_bins))
+    n_per = len(periods)
+    if len(time) < 10 or n_per == 0:
+        return {'n_bins': n_bins, 'phase': [], 'folds': []}
+    if epochs is None:
+        epochs = np.full(n_per, float(time[0]))
+    epochs = np.asarray(epochs, dtype=np.float64).reshape(-1)
+
+    # точки один раз упорядочиваем по потоку (общий порядок для всех периодов)
+    by_flux = np.argsort(flux, kind='stable')
+    flux_sorted = np.asarray(flux, dtype=np.float64)[by_flux]
+    time_sorted = np.asarray(time, dtype=np.float64)[by_flux]
+    del by_flux
+
+    # фазы всех периодов сразу: (n_per, n) в float64 (время — BJD, float32 тут не годится)
+    n_keys = n_per * n_bins
+    key_dtype = np.uint16 if n_keys <= np.iinfo(np.uint16).max else np.int64
+    phase = time_sorted[None, :] - epochs[:, None]
+    phase /= periods[:, None]
+    phase -= np.floor(phase)
+    phase *= n_bins
+    keys = phase.astype(key_dtype)
+    del phase, time_sorted
+    np.minimum(keys, n_bins - 1, out=keys)
+    keys += (np.arange(n_per) * n_bins).astype(key_dtype)[:, None]
+    keys = keys.reshape(-1)
+
+    counts = np.bincount(keys, minlength=n_keys)
+    sums = np.bincount(keys, weights=np.tile(flux_sorted, n_per), minlength=n_keys)
+    # стабильная сортировка 16-битных ключей — radix, O(n); порядок по потоку внутри бина сохраняется
+    order = np.argsort(keys, kind='stable')
+    del keys
+    grouped = flux_sorted[order % len(flux_sorted)]
+    del order
+
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    nonempty = counts > 0
+    lo = starts + np.maximum(counts - 1, 0) // 2
+    hi = starts + counts // 2
+    median = np.full(n_keys, np.nan)
+    median[nonempty] = 0.5 * (grouped[lo[nonempty]] + grouped[np.minimum(hi, len(grouped) - 1)[nonempty]])
+    mean = np.full(n_keys, np.nan)
+    mean[nonempty] = sums[nonempty] / counts[nonempty]
+
+    def _json(a):
+        return [None if not np.isfinite(v) else float(v) for v in a]
+
+    folds = []
+    for i in range(n_per):
+        sl = slice(i * n_bins, (i + 1) * n_bins)
+        folds.append({
+            'period': float(periods[i]),
+            'epoch': float(epochs[i]),
+            'median': _json(median[sl]),
+            'mean': _json(mean[sl]),
+            'count': counts[sl].astype(int).tolist(),
+        })
+    return {
+        'n_bins': n_bins,
+        'phase': ((np.arange(n_bins) + 0.5) / n_bins).tolist(),  # центры бинов
+        'folds': folds,
+    }
+
+def candidate_periods(time: np.ndarray, suspicious_regions: List[dict], transit_candidates: List[dict],
+                      max_periods: int = FOLD_MAX_PERIODS) -> List[dict]:
+    """
+    Периоды для фолдинга: [{'period', 'epoch', 'source'}], первый — основной (как раньше:
+    расстояние между двумя самыми глубокими подозрительными регионами, иначе span/10).
+    Далее — попарные расстояния между центрами кандидатов в транзиты (по убыванию глубины).
+    Почти совпадающие периоды (< 1%) и периоды короче 2 шагов / длиннее половины кривой отбрасываются.
+    """
+    if len(time) < 10:
+        return []
+    span = float(time[-1] - time[0])
+    step = float(time[1] - time[0])
+    out: List[dict] = []
+
+    def _add(period, epoch, source):
+        if not (2 * step <= period <= span / 2.0) and out:
+            return
+        if any(abs(period - o['period']) < 0.01 * o['period'] for o in out):
+            return
+        out.append({'period': float(period), 'epoch': float(epoch), 'source': source})
+
+    if suspicious_regions and len(suspicious_regions) >= 2:
+        _add(abs(suspicious_regions[1]['center'] - suspicious_regions[0]['center']),
+             suspicious_regions[0]['center'], 'suspicious_regions')
+    else:
+        _add(span / 10.0 if span > 0 else 1.0, time[0], 'default')
+    centers = [c['center_time'] for c in sorted(transit_candidates or [], key=lambda c: c['depth'], reverse=True)]
+    for i in range(len(centers)):
+        for j in range(i + 1, len(centers)):
+            if len(out) >= max_periods:
+                return out
+            _add(abs(centers[j] - centers[i]), centers[i], 'transit_candidates')
+    return out
+
+def fold_candidate_periods(time: np.ndarray, flux: np.ndarray, suspicious_regions: List[dict],
+                           transit_candidates: List[dict], n_bins: int = FOLD_BINS) -> dict:
+    """Компактные фолды для всех периодов-кандидатов; эпоха — центр региона/транзита (фаза 0)."""
+    cands = candidate_periods(time, suspicious_regions, transit_candidates)
+    res = fold_phase_binned(time, flux, [c['period'] for c in cands], [c['epoch'] for c in cands], n_bins=n_bins)
+    for fold, c in zip(res['folds'], cands):
+        fold['source'] = c['source']
+    return res
+
 def detect_transit_candidates(time: np.ndarray, flux: np.ndarray, n_candidates: int = 20,
                               min_prominence: float = None, min_width_pts: int = 2,
                               min_snr: float = 3.0) -> List[dict]:
@@ -702,26 +858,108 @@ def detect_transit_candidates(time: np.ndarray, flux: np.ndarray, n_candidates:
 # Основной эндпоинт /predict
 # -------------------------
 @app.post("/predict")
-async def predict(files: List[UploadFile] = File(...)):
+async def predict(files: List[UploadFile] = File(...), model: Optional[str] = None, mode: str = "full",
+                  x_profile: Optional[str] = Header(None), x_admin_token: Optional[str] = Header(None)):
     """
     Принимает FITS-файлы и возвращает предсказание экзопланеты.
+    ?model=<имя бандла> — явный выбор версии, иначе по долям трафика из манифеста.
+    ?mode=segments — отдельная вероятность для каждого квартала + агрегат (медиана) в 'aggregate'.
+    Одинаковые одновременные загрузки (тот же контент и версия модели) считаются один раз (single-flight).
+    Перед вычислением — оценка стоимости по колонке TIME и допуск в бюджет памяти/CPU:
+    слишком длинная сетка огрубляется или отклоняется (413), при занятом бюджете запрос ждёт (или 503).
+    Оценка и итоговый шаг сетки — в поле 'admission' ответа.
+    X-Profile: 1 + X-Admin-Token — запрос под семплирующим профайлером, id профиля в заголовке X-Profile-Id.
     """
-    # ✅ ЛОКАЛЬНАЯ ПЕРЕМЕННАЯ для подсчёта FITS файлов
-    fits_count = 0
-    
-    if not files or len(files) == 0:
-        raise HTTPException(status_code=400, detail="No files uploaded")
+    t0 = perf_counter()
+    prof = _profiler(x_profile, x_admin_token)
+    _check_mode(mode)
+    uploads = await _read_fits_uploads(files)
+    # ключ по содержимому: одинаковые загрузки попадают в один и тот же бандл при A/B-разбиении
+    upload_key = content_key(blobs=[fb for _, fb in uploads])
+    bundle = await _resolve_bundle("predict", version=model, routing_key=upload_key)
+    # разбор заголовков FITS (а для нестандартных таблиц — чтение целиком) — не на event loop
+    plan = await run_in_threadpool(_admission_plan, uploads, bundle, mode)
+    ok = False
+    try:
+        if prof is None:
+            result = await SINGLE_FLIGHT.do(
+                content_key("predict", bundle.name, plan.step_days, mode, upload_key),
+                lambda: _admitted(plan, lambda: run_in_threadpool(_run_predict, uploads, bundle, plan, mode)),
+            )
+        else:
+            # мимо single-flight: профиль должен описывать собственное вычисление запроса
+            result = await _admitted(
+                plan, lambda: run_in_threadpool(prof.call, _run_predict, uploads, bundle, plan, mode))
+        ok = True
+    finally:
+        MODEL_STATS.record(bundle.name, perf_counter() - t0, ok)
+        profile_id = await _save_profile("predict", prof, ok, model=bundle.name, mode=mode,
+                                         files=[name for name, _ in uploads])
+    return JSONResponse(result, headers=_profile_headers(profile_id))
 
-    time_list = []
-    flux_list = []
 
+def _check_mode(mode: str) -> None:
+    if mode not in PREDICT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown mode {mode!r}, expected one of {list(PREDICT_MODES)}")
+
+
+async def _read_fits_uploads(files: List[UploadFile]) -> List[Tuple[str, bytes]]:
+    """Проверка расширений и чтение загрузок в память: [(filename, bytes), ...]."""
+    if not files or len(files) == 0:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    uploads = []
     for uploaded in files:
         filename = uploaded.filename
         if not filename.lower().endswith('.fits'):
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {filename}")
+        uploads.append((filename, await uploaded.read()))
+    return uploads
+
+
+def _admission_plan(uploads: List[Tuple[str, bytes]], bundle: SimpleNamespace, mode: str = "full") -> CostEstimate:
+    """Предварительная оценка по колонкам TIME и выбор шага сетки (или 413). Разбирает FITS — вызывать в threadpool."""
+    step_days, med_kernel_hours, _ = _preprocessing_params(bundle)
+    columns = []
+    for _, fb in uploads:
         try:
-            fb = await uploaded.read()
-            t_part, f_part = read_time_flux_from_fitsbytes(fb)
+            columns.append(read_time_column_from_fitsbytes(fb))
+        except Exception:
+            # нестандартная таблица: читаем целиком; битый файл отклонит стадия загрузки
+            try:
+                columns.append(read_time_flux_from_fitsbytes(fb)[0])
+            except Exception:
+                pass
+    preset = bundle.preprocessing.get("tsfresh") or "efficient"
+    jobs = TSFRESH_SEGMENT_N_JOBS if mode == "segments" else TSFRESH_N_JOBS
+    try:
+        return ADMISSION.plan(lambda step, kernel: estimate_cost(columns, step, kernel, preset, jobs),
+                              step_days, med_kernel_hours)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=413, detail={"message": str(e), "admission": e.estimate.to_dict()})
+
+
+async def _admitted(plan: CostEstimate, fn):
+    """Выполнение fn() внутри бюджета ADMISSION; не дождались места — 503 с Retry-After."""
+    try:
+        return await ADMISSION.run(plan, fn)
+    except AdmissionTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+
+def _stage_load_curve(uploads: List[Tuple[str, bytes]], min_points: int,
+                      flux_dtype=np.float64) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Стадия 1: чтение FITS, склейка кварталов, маска конечных значений, сортировка.
+    Маска применяется до сортировки: одна копия вместо двух, куски кварталов освобождаются сразу.
+    """
+    # ✅ ЛОКАЛЬНАЯ ПЕРЕМЕННАЯ для подсчёта FITS файлов
+    fits_count = 0
+    time_list = []
+    flux_list = []
+
+    for filename, fb in uploads:
+        try:
+            t_part, f_part = read_time_flux_from_fitsbytes(fb, flux_dtype=flux_dtype)
             if t_part is not None and f_part is not None and len(t_part) > 0:
                 time_list.append(t_part)
                 flux_list.append(f_part)
@@ -735,136 +973,399 @@ async def predict(files: List[UploadFile] = File(...)):
     
     tcat = np.concatenate(time_list)
     fcat = np.concatenate(flux_list)
+    del time_list, flux_list
+
+    mask_good = np.isfinite(tcat) & np.isfinite(fcat)
+    if not mask_good.all():
+        tcat = tcat[mask_good]
+        fcat = fcat[mask_good]
+    del mask_good
 
-    order = np.argsort(tcat)
+    order = np.argsort(tcat, kind='stable')
     tcat = tcat[order]
     fcat = fcat[order]
+    del order
 
-    mask_good = np.isfinite(tcat) & np.isfinite(fcat)
-    tcat = tcat[mask_good]
-    fcat = fcat[mask_good]
-
-    if len(tcat) < MIN_POINTS_AFTER_CLEAN:
+    if len(tcat) < min_points:
         raise HTTPException(status_code=400, detail=f"Not enough valid points after cleaning: {len(tcat)}")
+    return tcat, fcat, fits_count
 
-    raw_curve_time = tcat.tolist()
-    raw_curve_flux = fcat.tolist()
 
+def _stage_process_curve(tcat: np.ndarray, fcat: np.ndarray, step_days: float, med_kernel_hours: int,
+                         min_points: int, degrade_factor: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Стадия 2: срез выбросов, ресемплинг на сетку и детренд.
+    degrade_factor — во сколько раз admission огрубил шаг: бокс суммирует поток, поэтому
+    при шаге x k амплитуда тоже растёт ~k раз; делим обратно, чтобы модель видела привычный масштаб.
+    """
     if len(fcat) > 5:
         med = np.median(fcat)
-        mad = np.median(np.abs(fcat - med))
+        # |f - med| считается один раз в одном буфере и нужен и для MAD, и для маски
+        dev = np.subtract(fcat, med)
+        np.abs(dev, out=dev)
+        mad = np.median(dev)
         if mad == 0:
             mad = np.std(fcat) if np.std(fcat) > 0 else 1.0
-        spike_mask = (np.abs(fcat - med) < 10 * mad)
-        if spike_mask.sum() < len(spike_mask):
+        spike_mask = dev < 10 * mad
+        del dev
+        if not spike_mask.all():
             tcat = tcat[spike_mask]
             fcat = fcat[spike_mask]
+        del spike_mask
 
-    grid, flux_detr = resample_to_1h_and_detrend(tcat, fcat, step_days=STEP_DAYS, med_kernel_hours=MED_KERNEL_HOURS)
+    grid, flux_detr = resample_to_1h_and_detrend(tcat, fcat, step_days=step_days, med_kernel_hours=med_kernel_hours)
     if grid is None or flux_detr is None:
         raise HTTPException(status_code=500, detail="Failed to resample/detrend signal")
+    if degrade_factor > 1:
+        flux_detr /= degrade_factor
 
-    if len(flux_detr) < MIN_POINTS_AFTER_CLEAN:
+    if len(flux_detr) < min_points:
         raise HTTPException(status_code=400, detail=f"Too few points after resampling/detrending: {len(flux_detr)}")
+    return grid, flux_detr
 
-    processed_curve_time = grid.tolist()
-    processed_curve_flux = flux_detr.tolist()
 
-    df_tsf = pd.DataFrame({
-        'id': 1,
-        'time': np.arange(len(flux_detr), dtype=float),
-        'flux': flux_detr
-    })
+def _stage_candidates(grid: np.ndarray, flux_detr: np.ndarray, fits_count: int) -> dict:
+    """Стадия 3: подозрительные регионы, фолдинг, кандидаты в транзиты, сегменты."""
+    suspicious_regions = detect_suspicious_regions(grid, flux_detr, num_regions=5)
+    
+    try:
+        transit_candidates = detect_transit_candidates(grid, flux_detr, n_candidates=5)
+    except Exception:
+        transit_candidates = []
+
+    # фолды по фазовым бинам для нескольких периодов сразу; folded_curve — основной период
+    # в прежнем формате phase/flux/period (медиана по бинам вместо всех точек)
+    folds = fold_candidate_periods(grid, flux_detr, suspicious_regions, transit_candidates)
+    if folds['folds']:
+        main_fold = folds['folds'][0]
+        folded_data = {'phase': folds['phase'], 'flux': main_fold['median'], 'period': main_fold['period'],
+                       'count': main_fold['count'], 'n_bins': folds['n_bins']}
+    else:
+        folded_data = {'phase': [], 'flux': [], 'period': 0}
+
+    # ✅ Сегменты создаются ЛОКАЛЬНО на основе ЛОКАЛЬНОГО счётчика
+    try:
+        num_segments = fits_count  # используем локальную переменную
+        segs = []
+        tmin = float(grid[0]); tmax = float(grid[-1])
+        for si in range(num_segments):
+            s = tmin + (tmax - tmin) * si / num_segments
+            e = tmin + (tmax - tmin) * (si + 1) / num_segments
+            segs.append({'index': si, 'start': s, 'end': e, 'center': (s + e) / 2.0})
+    except Exception:
+        segs = []
+
+    return {
+        'suspicious_regions': suspicious_regions,
+        'folded_curve': folded_data,
+        'folds': folds,
+        'transit_candidates': transit_candidates,
+        'segments': segs,
+    }
+
 
+def _features_matrix(df_tsf: pd.DataFrame, bundle: SimpleNamespace, n_jobs: int) -> pd.DataFrame:
+    """Признаки tsfresh по всем id фрейма -> матрица в порядке bundle.feature_cols, масштабированная."""
     try:
         X_feats = extract_features(df_tsf, column_id='id', column_sort='time', column_value='flux',
-                                   default_fc_parameters=TSFRESH_PARAMS, n_jobs=TSFRESH_N_JOBS)
+                                   default_fc_parameters=_tsfresh_params(bundle), n_jobs=n_jobs)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"tsfresh extract_features failed: {str(e)}")
 
     X_feats = X_feats.fillna(0)
     X_feats.columns = [clean_column_name(c) for c in X_feats.columns]
 
-    missing_cols = [c for c in FEATURE_COLS if c not in X_feats.columns]
+    missing_cols = [c for c in bundle.feature_cols if c not in X_feats.columns]
     if missing_cols:
         for c in missing_cols:
             X_feats[c] = 0.0
-    X_new = X_feats.reindex(columns=FEATURE_COLS, fill_value=0.0)
+    X_new = X_feats.reindex(columns=bundle.feature_cols, fill_value=0.0)
 
-    cont_cols_present = [c for c in CONTINOUS_COLS if c in X_new.columns]
+    cont_cols_present = [c for c in bundle.continouos_cols if c in X_new.columns]
     if len(cont_cols_present) > 0:
         try:
-            X_new.loc[:, cont_cols_present] = scaler.transform(X_new[cont_cols_present])
+            X_new.loc[:, cont_cols_present] = bundle.scaler.transform(X_new[cont_cols_present])
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Scaler transform failed: {str(e)}")
+    return X_new
 
+
+def _predict_rows(X_new: pd.DataFrame, bundle: SimpleNamespace) -> np.ndarray:
     try:
-        proba = model.predict(X_new)
-        proba_val = float(proba[0])
+        return np.asarray(bundle.model.predict(X_new), dtype=float)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Model prediction failed: {str(e)}")
 
-    is_exo = bool(proba_val > 0.52)
 
+def _top_features(bundle: SimpleNamespace, values: pd.Series) -> List[dict]:
+    """Топ-20 признаков по gain-важности модели со значениями из values."""
     try:
-        importances = model.feature_importance(importance_type='gain')
-        feat_imp_pairs = list(zip(FEATURE_COLS, importances))
+        importances = bundle.model.feature_importance(importance_type='gain')
+        feat_imp_pairs = list(zip(bundle.feature_cols, importances))
         feat_imp_pairs_sorted = sorted(feat_imp_pairs, key=lambda x: x[1], reverse=True)
         top_k = feat_imp_pairs_sorted[:20]
         top_features_list = []
         for name, imp in top_k:
-            val = float(X_new.iloc[0].get(name, 0.0))
+            val = float(values.get(name, 0.0))
             top_features_list.append({'name': name, 'value': val, 'importance': float(imp)})
     except Exception:
         top_features_list = []
-    
-    suspicious_regions = detect_suspicious_regions(grid, flux_detr, num_regions=5)
-    
-    estimated_period = None
-    if suspicious_regions and len(suspicious_regions) >= 2:
-        estimated_period = abs(suspicious_regions[1]['center'] - suspicious_regions[0]['center'])
-    
-    folded_data = calculate_folded_curve(grid, flux_detr, period=estimated_period)
-    
-    try:
-        transit_candidates = detect_transit_candidates(grid, flux_detr, n_candidates=5)
-    except Exception:
-        transit_candidates = []
+    return top_features_list
 
-    # ✅ Сегменты создаются ЛОКАЛЬНО на основе ЛОКАЛЬНОГО счётчика
-    try:
-        num_segments = fits_count  # используем локальную переменную
-        segs = []
-        tmin = float(grid[0]); tmax = float(grid[-1])
-        for si in range(num_segments):
-            s = tmin + (tmax - tmin) * si / num_segments
-            e = tmin + (tmax - tmin) * (si + 1) / num_segments
-            segs.append({'index': si, 'start': s, 'end': e, 'center': (s + e) / 2.0})
-    except Exception:
-        segs = []
 
-    # ✅ Формируем НОВЫЙ результат для каждого запроса
-    result = {
+def _stage_classify(flux_detr: np.ndarray, bundle: SimpleNamespace) -> dict:
+    """Стадия 4: признаки tsfresh, масштабирование, LightGBM, топ-20 признаков."""
+    df_tsf = pd.DataFrame({
+        'id': 1,
+        'time': np.arange(len(flux_detr), dtype=float),
+        'flux': flux_detr
+    })
+    X_new = _features_matrix(df_tsf, bundle, TSFRESH_N_JOBS)
+    proba_val = float(_predict_rows(X_new, bundle)[0])
+    is_exo = bool(proba_val > bundle.threshold)
+
+    return {
         'exoplanet': is_exo,
         'probability': proba_val,
-        'features': top_features_list,
-        'raw_curve': {'time': raw_curve_time, 'flux': raw_curve_flux},
-        'processed_curve': {'time': processed_curve_time, 'flux': processed_curve_flux},
+        'features': _top_features(bundle, X_new.iloc[0]),
+        'model': bundle.name,
+    }
+
+
+def _file_start_times(uploads: List[Tuple[str, bytes]]) -> List[float]:
+    """Начало каждого загруженного файла (квартала) — только по колонке TIME."""
+    starts = []
+    for _, fb in uploads:
+        try:
+            t = read_time_column_from_fitsbytes(fb)
+        except Exception:
+            try:
+                t = read_time_flux_from_fitsbytes(fb)[0]
+            except Exception:
+                continue
+        t = t[np.isfinite(t)]
+        if len(t):
+            starts.append(float(t.min()))
+    return starts
+
+
+def _curve_segments(tcat: np.ndarray, grid: np.ndarray, min_points: int,
+                    file_starts: List[float]) -> Tuple[List[dict], List[slice]]:
+    """
+    Сегменты кривой: границы — начала загруженных файлов (кварталов) и разрывы во времени
+    больше SEGMENT_GAP_DAYS. Возвращает описания сегментов и их срезы на сетке
+    (интерполированные разрывы между сегментами в срезы не входят).
+    Сегменты короче min_points точек сетки помечаются skipped.
+    """
+    bounds = set(int(i) + 1 for i in np.flatnonzero(np.diff(tcat) > SEGMENT_GAP_DAYS))
+    bounds.update(int(np.searchsorted(tcat, t0, side='left')) for t0 in file_starts)
+    bounds = sorted(b for b in bounds if 0 < b < len(tcat))
+    segs, slices = [], []
+    for lo_t, hi_t in zip([0] + bounds, bounds + [len(tcat)]):
+        start, end = float(tcat[lo_t]), float(tcat[hi_t - 1])
+        lo = int(np.searchsorted(grid, start, side='left'))
+        hi = int(np.searchsorted(grid, end, side='right'))
+        segs.append({'index': len(segs), 'start': start, 'end': end, 'center': (start + end) / 2.0,
+                     'n_points': hi - lo, 'skipped': hi - lo < min_points,
+                     'probability': None, 'exoplanet': None})
+        slices.append(slice(lo, hi))
+    return segs, slices
+
+
+def _stage_classify_segments(tcat: np.ndarray, grid: np.ndarray, flux_detr: np.ndarray,
+                             bundle: SimpleNamespace, min_points: int, file_starts: List[float]) -> dict:
+    """
+    Стадия 4 в режиме mode=segments: каждый квартал/сегмент — отдельный ряд tsfresh (свой id).
+    Один вызов extract_features (n_jobs=TSFRESH_SEGMENT_N_JOBS: ряды считаются параллельно
+    на доле ядер воркера), один батч model.predict на все сегменты.
+    Итоговая вероятность — медиана по сегментам: один шумный квартал не перетягивает результат.
+    """
+    segs, slices = _curve_segments(tcat, grid, min_points, file_starts)
+    used = [sg['index'] for sg in segs if not sg['skipped']]
+    if not used:
+        # ни один сегмент не дотягивает до min_points — классифицируем кривую целиком
+        return dict(_stage_classify(flux_detr, bundle), segments=segs, aggregate=None)
+
+    ids = np.concatenate([np.full(segs[i]['n_points'], i, dtype=np.int32) for i in used])
+    df_tsf = pd.DataFrame({
+        'id': ids,
+        'time': np.concatenate([np.arange(segs[i]['n_points'], dtype=float) for i in used]),
+        'flux': np.concatenate([flux_detr[slices[i]] for i in used]),
+    })
+    del ids
+    X_new = _features_matrix(df_tsf, bundle, TSFRESH_SEGMENT_N_JOBS)
+    del df_tsf
+    proba = _predict_rows(X_new, bundle)
+    by_id = dict(zip(X_new.index.tolist(), proba.tolist()))
+
+    for i, p in by_id.items():
+        segs[i]['probability'] = float(p)
+        segs[i]['exoplanet'] = bool(p > bundle.threshold)
+
+    agg = float(np.median(proba))
+    return {
+        'exoplanet': bool(agg > bundle.threshold),
+        'probability': agg,
+        'features': _top_features(bundle, X_new.median(axis=0)),
+        'model': bundle.name,
+        'segments': segs,
+        'aggregate': {
+            'method': 'median',
+            'n_segments': int(len(proba)),
+            'median': agg,
+            'mean': float(np.mean(proba)),
+            'max': float(np.max(proba)),
+            'min': float(np.min(proba)),
+            'positive_segments': int(np.sum(proba > bundle.threshold)),
+        },
+    }
+
+
+def _flux_dtype(bundle: SimpleNamespace):
+    return FLUX_DTYPES.get(bundle.preprocessing.get("precision", PRECISION), np.float64)
+
+
+def _preprocessing_params(bundle: SimpleNamespace) -> Tuple[float, int, int]:
+    prep = bundle.preprocessing
+    step_days = float(prep.get("step_days", STEP_DAYS))
+    med_kernel_hours = int(prep.get("med_kernel_hours", MED_KERNEL_HOURS))
+    min_points = int(prep.get("min_points_after_clean", MIN_POINTS_AFTER_CLEAN))
+    return step_days, med_kernel_hours, min_points
+
+
+def _run_predict(uploads: List[Tuple[str, bytes]], bundle: SimpleNamespace,
+                 plan: Optional[CostEstimate] = None, mode: str = "full") -> dict:
+    """
+    Пайплайн /predict для одного бандла kind="lightcurve".
+    CPU-bound: вызывается в threadpool, чтобы не блокировать event loop.
+    plan (admission) может огрубить шаг сетки относительно предобработки бандла.
+    mode="segments" — классификация по кварталам (см. _stage_classify_segments).
+    """
+    step_days, med_kernel_hours, min_points = _preprocessing_params(bundle)
+    degrade_factor = 1
+    if plan is not None:
+        step_days, med_kernel_hours = plan.step_days, plan.med_kernel_hours
+        degrade_factor = plan.degrade_factor
+    tcat, fcat, fits_count = _stage_load_curve(uploads, min_points, flux_dtype=_flux_dtype(bundle))
+
+    grid, flux_detr = _stage_process_curve(tcat, fcat, step_days, med_kernel_hours, min_points, degrade_factor)
+
+    if mode == "segments":
+        prediction = _stage_classify_segments(tcat, grid, flux_detr, bundle, min_points,
+                                              _file_start_times(uploads))
+    else:
+        prediction = _stage_classify(flux_detr, bundle)
+    candidates = _stage_candidates(grid, flux_detr, fits_count)
+
+    # списки Python (~32 байта на точку) строим в самом конце, из массивов, а не держим всю обработку
+    # ✅ Формируем НОВЫЙ результат для каждого запроса
+    result = {
+        'exoplanet': prediction['exoplanet'],
+        'probability': prediction['probability'],
+        # сетка огрублена admission: модель обучена на другом шаге, вероятность — только ориентир
+        'degraded': degrade_factor > 1,
+        'features': prediction['features'],
+        'raw_curve': {'time': tcat.tolist(), 'flux': fcat.tolist()},
+        'processed_curve': {'time': grid.tolist(), 'flux': flux_detr.tolist()},
         'FITS_value': fits_count,  # ✅ локальная переменная
-        'suspicious_regions': suspicious_regions,
-        'folded_curve': folded_data,
-        'transit_candidates': transit_candidates,
-        'segments': segs
+        'suspicious_regions': candidates['suspicious_regions'],
+        'folded_curve': candidates['folded_curve'],
+        'folds': candidates['folds'],
+        'transit_candidates': candidates['transit_candidates'],
+        'segments': candidates['segments'],
+        'model': bundle.name
     }
+    if mode == "segments":
+        # сегменты — настоящие кварталы с вероятностями вместо равных долей по числу файлов
+        result['segments'] = prediction['segments']
+        result['aggregate'] = prediction['aggregate']
+        result['mode'] = mode
+    if plan is not None:
+        result['admission'] = plan.to_dict()
+
+    return result
+
+
+# -------------------------
+# Потоковый вариант /predict (NDJSON)
+# -------------------------
+def _ndjson(event: dict) -> bytes:
+    return (json.dumps(event, separators=(',', ':')) + "\n").encode("utf-8")
 
-    return JSONResponse(result)
+
+@app.post("/predict_stream")
+async def predict_stream(files: List[UploadFile] = File(...), model: Optional[str] = None, mode: str = "full"):
+    """
+    То же, что /predict, но результат отдаётся по стадиям (application/x-ndjson, одно событие на строку):
+      {"stage": "raw_curve", ...} -> {"stage": "processed_curve", ...} -> {"stage": "candidates", ...}
+      -> {"stage": "prediction", ...} -> {"stage": "done"}
+    Кривые готовы задолго до tsfresh и бустера, поэтому фронт может рисовать график сразу.
+    Ошибки чтения/валидации отдаются обычным HTTP-кодом; ошибка на поздней стадии —
+    событием {"stage": "error", "status": ..., "detail": ...}.
+    Одинаковые одновременные загрузки считаются один раз (ключ как у /predict): события стадий
+    рассылаются всем ожидающим.
+    """
+    t0 = perf_counter()
+    _check_mode(mode)
+    uploads = await _read_fits_uploads(files)
+    upload_key = content_key(blobs=[fb for _, fb in uploads])
+    bundle = await _resolve_bundle("predict", version=model, routing_key=upload_key)
+    _, _, min_points = _preprocessing_params(bundle)
+    plan = await run_in_threadpool(_admission_plan, uploads, bundle, mode)
+    step_days, med_kernel_hours = plan.step_days, plan.med_kernel_hours
+    flight_key = content_key("predict", bundle.name, plan.step_days, mode, upload_key)
+    # первая стадия до начала ответа: ошибки загрузки — обычный 400, как у /predict
+    tcat, fcat, fits_count = await SINGLE_FLIGHT.do(
+        content_key("load_curve", flight_key),
+        lambda: run_in_threadpool(_stage_load_curve, uploads, min_points, _flux_dtype(bundle)))
+
+    async def stages():
+        # одно вычисление на ключ; события сериализуются один раз и уходят всем ожидающим
+        async with ADMISSION.reserve(plan):
+            grid, flux_detr = await run_in_threadpool(_stage_process_curve, tcat, fcat, step_days,
+                                                      med_kernel_hours, min_points, plan.degrade_factor)
+            yield _ndjson({'stage': 'processed_curve',
+                           'processed_curve': {'time': grid.tolist(), 'flux': flux_detr.tolist()}})
+            candidates = await run_in_threadpool(_stage_candidates, grid, flux_detr, fits_count)
+            yield _ndjson(dict(candidates, stage='candidates'))
+            if mode == "segments":
+                # _file_start_times разбирает заголовки всех файлов — тоже в threadpool
+                prediction = await run_in_threadpool(
+                    lambda: _stage_classify_segments(tcat, grid, flux_detr, bundle, min_points,
+                                                     _file_start_times(uploads)))
+            else:
+                prediction = await run_in_threadpool(_stage_classify, flux_detr, bundle)
+            yield _ndjson(dict(prediction, stage='prediction', degraded=plan.degraded))
+
+    async def events():
+        ok = False
+        try:
+            yield _ndjson({'stage': 'raw_curve', 'FITS_value': fits_count, 'model': bundle.name,
+                           'admission': plan.to_dict(),
+                           'raw_curve': {'time': tcat.tolist(), 'flux': fcat.tolist()}})
+            # общее вычисление не отменяется при обрыве соединения: его могут ждать другие запросы
+            async for line in SINGLE_FLIGHT.stream(flight_key, stages):
+                yield line
+            yield _ndjson({'stage': 'done', 'elapsed_s': perf_counter() - t0})
+            ok = True
+        except AdmissionTimeout as e:
+            yield _ndjson({'stage': 'error', 'status': 503, 'detail': str(e)})
+        except HTTPException as e:
+            yield _ndjson({'stage': 'error', 'status': e.status_code, 'detail': e.detail})
+        except Exception as e:
+            yield _ndjson({'stage': 'error', 'status': 500, 'detail': str(e)})
+        finally:
+            MODEL_STATS.record(bundle.name, perf_counter() - t0, ok)
+
+    # X-Accel-Buffering: не даём nginx-подобным прокси копить поток целиком
+    return StreamingResponse(events(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/model2/meta")
-def model2_meta():
-    if FEATURE_COLS2 is None:
-        raise HTTPException(status_code=500, detail="Model v2 not loaded")
-    human = {feat: human_label_from_feature(feat) for feat in FEATURE_COLS2}
-    return {"feature_cols": FEATURE_COLS2, "human_names": human}
+async def model2_meta(model: Optional[str] = None):
+    feature_cols2 = (await _resolve_bundle("predict_second", version=model)).feature_cols
+    human = {feat: human_label_from_feature(feat) for feat in feature_cols2}
+    return {"feature_cols": list(feature_cols2), "human_names": human}
 
 @app.post("/predict_second")
 async def predict_second(
@@ -872,6 +1373,9 @@ async def predict_second(
     csv_file: Optional[UploadFile] = File(None),
     koi_time0bk: Optional[str] = Form(None),
     koi_duration: Optional[str] = Form(None),
+    model: Optional[str] = None,
+    x_profile: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
 ):
 
     """
@@ -879,10 +1383,31 @@ async def predict_second(
      - если ручной ввод и оба REQUIRED_FIELDS_V2 заполнены (и не 0) -> используем ручной ввод (1 строка)
      - иначе если csv_file указан -> используем CSV
      - иначе -> ошибка (нужно что-то ввести)
+    X-Profile: 1 + X-Admin-Token — запрос под семплирующим профайлером, id профиля в заголовке X-Profile-Id.
     """
-    if model2 is None:
-        raise HTTPException(status_code=500, detail="Model v2 not loaded on server.")
-
+    prof = _profiler(x_profile, x_admin_token)
+    bundle = await _resolve_bundle("predict_second", version=model)
+    t0 = perf_counter()
+    ok = False
+    try:
+        form_dict, content = await _read_predict_second_input(request, csv_file, koi_time0bk, koi_duration)
+        # CPU-часть v2 — в пуле потоков, как у /predict; под профайлером семплируется именно этот поток
+        if prof is None:
+            results = await run_in_threadpool(_run_predict_second, form_dict, content, bundle)
+        else:
+            results = await run_in_threadpool(prof.call, _run_predict_second, form_dict, content, bundle)
+        ok = True
+    finally:
+        MODEL_STATS.record(bundle.name, perf_counter() - t0, ok)
+        profile_id = await _save_profile("predict_second", prof, ok, model=bundle.name,
+                                         csv=csv_file.filename if csv_file is not None else None)
+    return JSONResponse({"count": len(results), "results": results, "model": bundle.name},
+                        headers=_profile_headers(profile_id))
+
+
+async def _read_predict_second_input(request: Request, csv_file: Optional[UploadFile], koi_time0bk: Optional[str],
+                                     koi_duration: Optional[str]) -> Tuple[Optional[dict], Optional[bytes]]:
+    """Вход /predict_second: (form-поля, None) для ручного ввода или (None, байты CSV)."""
     # Собираем наличие ручного ввода (проверяем только обязательные поля)
     manual_has_required = False
     try:
@@ -900,11 +1425,22 @@ async def predict_second(
     if manual_has_required:
         # читаем все form-поля динамически
         form = await request.form()
-        form_dict = {str(k): str(v).strip() for k, v in form.items()}
+        return {str(k): str(v).strip() for k, v in form.items()}, None
+
+    # используем CSV
+    if csv_file is None:
+        raise HTTPException(status_code=400, detail="No valid manual input and no CSV provided for model v2.")
+    if not csv_file.filename.lower().endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files accepted for predict_second.")
+    return None, await csv_file.read()
 
+
+def _run_predict_second(form_dict: Optional[dict], content: Optional[bytes], bundle: SimpleNamespace) -> list:
+    """Пайплайн /predict_second для одного бандла kind="features" (синхронный, выполняется в пуле потоков)."""
+    if form_dict is not None:
         # создаём одну строку, пытаясь сопоставить каждое FEATURE_COLS2
         row = {}
-        for feat in FEATURE_COLS2:
+        for feat in bundle.feature_cols:
             value_found = None
 
             # 1) прямое совпадение имени
@@ -944,12 +1480,6 @@ async def predict_second(
             raise HTTPException(status_code=400, detail="Manual input provided but koi_time0bk or koi_duration missing/invalid after parsing.")
 
     else:
-        # используем CSV
-        if csv_file is None:
-            raise HTTPException(status_code=400, detail="No valid manual input and no CSV provided for model v2.")
-        if not csv_file.filename.lower().endswith(".csv"):
-            raise HTTPException(status_code=400, detail="Only CSV files accepted for predict_second.")
-        content = await csv_file.read()
         try:
             s = content.decode("utf-8")
         except:
@@ -958,7 +1488,7 @@ async def predict_second(
         if df_raw.shape[0] == 0:
             raise HTTPException(status_code=400, detail="CSV is empty.")
         # маппим csv в expected features
-        df = _map_csv_to_features_v2(df_raw, FEATURE_COLS2)
+        df = _map_csv_to_features_v2(df_raw, bundle.feature_cols)
         # проверим, что у каждой строки есть обязательные поля (после маппинга)
         missing_req = df['koi_time0bk'].isna() | df['koi_duration'].isna()
         if missing_req.any():
@@ -968,8 +1498,168 @@ async def predict_second(
 
     # теперь предсказание
     try:
-        results = _prepare_and_predict_v2(df)
+        results = _prepare_and_predict_v2(df, bundle)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction v2 failed: {e}")
 
-    return JSONResponse({"count": len(results), "results": results})
\ No newline at end of file
+    return results
+
+@app.get("/models")
+def models_info():
+    """Бандлы из манифеста (загружен/нет), маршруты и латентность/пропускная способность по каждой версии."""
+    info = ARTIFACTS.current().describe()
+    info["stats"] = MODEL_STATS.snapshot()
+    info["artifacts_version"] = ARTIFACTS.info()["version"]
+    return info
+
+
+# -------------------------
+# Каталог планет: локальный снимок Kepler/TESS, фильтры и пагинация на сервере
+# -------------------------
+# Снимок загружается один раз при импорте (в pre-fork режиме — в master, воркеры делят его copy-on-write)
+try:
+    CATALOG = CatalogIndex.load(CATALOG_SNAPSHOT_PATH)
+    print(f"Catalog snapshot loaded: {CATALOG.n} rows.")
+except FileNotFoundError:
+    # свежий checkout: маленькая выборка из репозитория, чтобы /catalog/* не отвечал 503
+    try:
+        CATALOG = CatalogIndex.load_fallback(CATALOG_FALLBACK_PATH)
+        print(f"Catalog snapshot not found: {CATALOG_SNAPSHOT_PATH}, using bundled sample ({CATALOG.n} rows); "
+              f"build the real one with `python catalog.py snapshot --confirmed-only`")
+    except (OSError, ValueError) as e:
+        CATALOG = None
+        print(f"Catalog snapshot not found: {CATALOG_SNAPSHOT_PATH}, bundled sample failed: {e}")
+
+CATALOG_CACHE_CONTROL = "public, max-age=300"
+
+
+def _catalog_or_503() -> CatalogIndex:
+    if CATALOG is None:
+        raise HTTPException(status_code=503, detail="Catalog snapshot not loaded on server.")
+    return CATALOG
+
+
+def _catalog_response(request: Request, payload_fn):
+    """
+    Ответ с ETag = версия снимка + параметры запроса.
+    Совпал If-None-Match -> 304 без вычисления выборки.
+    """
+    catalog = _catalog_or_503()
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    etag = f'W/"{catalog.version}-{hashlib.sha1(f"{request.url.path}?{query}".encode()).hexdigest()[:12]}"'
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload_fn(catalog), headers=headers)
+
+
+@app.get("/catalog/meta")
+def catalog_meta(request: Request):
+    """Версия снимка, фасеты (mission/disposition/planet_type) и диапазоны числовых колонок."""
+    return _catalog_response(request, lambda catalog: catalog.describe())
+
+
+@app.get("/catalog/planets")
+def catalog_planets(request: Request, q: Optional[str] = None, sort: Optional[str] = None,
+                    page: int = 0, page_size: int = 24):
+    """
+    Выборка из каталога с пагинацией.
+      q=<подстрока имени>; mission=, disposition=, planet_type= (можно повторять);
+      <колонка>_min / <колонка>_max для числовых колонок (koi_period_min=10&koi_prad_max=2);
+      sort=<колонка> или sort=-<колонка>; page (с 0), page_size (до 200).
+    """
+    params = request.query_params
+    filters = {c: params.getlist(c) for c in CATEGORICAL_COLS if params.getlist(c)}
+    ranges = {}
+    for c in CATALOG_NUMERIC_COLS:
+        lo, hi = params.get(f"{c}_min"), params.get(f"{c}_max")
+        if lo is None and hi is None:
+            continue
+        try:
+            ranges[c] = (float(lo) if lo not in (None, "") else None, float(hi) if hi not in (None, "") else None)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid range for {c}: {lo!r}..{hi!r}")
+    if sort and sort.lstrip("-") not in CATALOG_NUMERIC_COLS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort}")
+    return _catalog_response(request, lambda catalog: dict(
+        catalog.query(q=q, filters=filters, ranges=ranges, sort=sort, page=page, page_size=page_size),
+        version=catalog.version, sample=bool(catalog.meta.get("sample"))))
+
+
+@app.get("/stats")
+def stats():
+    """
+    Счётчики single-flight (сколько вычислений запущено и сколько запросов к ним присоединилось)
+    и admission control (допущено/огрублено/отклонено, занятый бюджет, очередь).
+    """
+    return {"singleflight": SINGLE_FLIGHT.stats(), "admission": ADMISSION.stats()}
+
+
+# -------------------------
+# Админ-эндпоинты: артефакты модели и hot reload
+# -------------------------
+def _require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled (set EXO_ADMIN_TOKEN)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.get("/admin/artifacts")
+def admin_artifacts(x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    ARTIFACTS.current()  # подхватить версию, объявленную другим воркером
+    return ARTIFACTS.info()
+
+
+@app.post("/admin/reload")
+def admin_reload(x_admin_token: Optional[str] = Header(None)):
+    """
+    Перечитывает файлы артефактов и атомарно подменяет набор.
+    Запросы «в полёте» дорабатывают на старом наборе; при ошибке загрузки старый набор остаётся.
+    Синхронный def -> FastAPI выполняет его в threadpool и не блокирует event loop.
+    """
+    _require_admin(x_admin_token)
+    try:
+        return ARTIFACTS.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, previous artifacts kept: {e}")
+
+
+# -------------------------
+# Профилирование запросов по требованию (см. profiling.py)
+# -------------------------
+def _profiler(x_profile: Optional[str], x_admin_token: Optional[str]) -> Optional[SamplingProfiler]:
+    """Профайлер, если запрошен заголовком X-Profile (только с валидным админ-токеном), иначе None."""
+    if not x_profile or x_profile.lower() in ("0", "false", "no"):
+        return None
+    _require_admin(x_admin_token)
+    return SamplingProfiler()
+
+
+async def _save_profile(endpoint: str, prof: Optional[SamplingProfiler], ok: bool, **meta) -> Optional[str]:
+    """Сохраняет профиль (и для упавшего запроса — там он нужнее всего); None, если профилирования не было."""
+    if prof is None or not prof.started:
+        return None
+    return await run_in_threadpool(PROFILES.save, endpoint, prof, dict(meta, ok=ok))
+
+
+def _profile_headers(profile_id: Optional[str]) -> Optional[dict]:
+    return {"X-Profile-Id": profile_id} if profile_id else None
+
+
+@app.get("/profiles")
+def profiles_list(x_admin_token: Optional[str] = Header(None)):
+    """Сохранённые профили (новые первыми): длительность, число семплов, топ функций по self-времени."""
+    _require_admin(x_admin_token)
+    return {"retain": PROFILES.retain, "profiles": PROFILES.list()}
+
+
+@app.get("/profiles/{profile_id}")
+def profile_get(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Профиль в формате speedscope: открыть на https://www.speedscope.app или `speedscope <file>`."""
+    _require_admin(x_admin_token)
+    path = PROFILES.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id!r} not found (evicted or never existed)")
+    return FileResponse(path, media_type="application/json", filename=f"{profile_id}.speedscope.json")
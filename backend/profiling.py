@@ -0,0 +1,190 @@
+# backend/profiling.py
+"""
+Профилирование отдельных запросов по требованию (только для админа).
+
+Запрос с заголовками X-Profile: 1 и X-Admin-Token выполняется под семплирующим профайлером:
+отдельный поток каждые interval_ms снимает стек потока, в котором идёт вычисление
+(sys._current_frames), — код пайплайна не инструментируется. Профиль сохраняется
+в формате speedscope (https://www.speedscope.app) в каталог EXO_PROFILE_DIR под id,
+который возвращается в заголовке ответа X-Profile-Id; хранятся последние PROFILE_RETAIN штук.
+Каталог общий для всех воркеров (serve.py), поэтому GET /profiles/{id} работает на любом из них.
+
+Без заголовка профайлер не создаётся вообще: ни потока, ни хуков — накладных расходов нет.
+Процессы tsfresh (n_jobs > 1) в профиль не попадают — видно только ожидание их результата.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_DIR = os.environ.get("EXO_PROFILE_DIR", "profiles")
+PROFILE_RETAIN = int(os.environ.get("EXO_PROFILE_RETAIN", 20))
+PROFILE_INTERVAL_MS = float(os.environ.get("EXO_PROFILE_INTERVAL_MS", 5))
+MAX_STACK_DEPTH = 200
+TOP_FUNCTIONS = 15
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{9}-[a-z_]+-[0-9a-f]{8}$")
+
+
+class SamplingProfiler:
+    """
+    Семплирование стека одного потока фоновым потоком (по умолчанию — того, что вошёл в with).
+        with SamplingProfiler() as prof:
+            work()
+        prof.to_speedscope("name")
+    Для threadpool: run_in_threadpool(prof.call, fn, *args) — профилируется поток воркера.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval_s = max(0.001, interval_ms / 1000.0)
+        self._frames: Dict[Tuple[str, str, int], int] = {}
+        self._samples: List[Tuple[int, ...]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = 0.0
+        self.elapsed_s = 0.0
+
+    def _frame_index(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        idx = self._frames.get(key)
+        if idx is None:
+            idx = self._frames[key] = len(self._frames)
+        return idx
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(self._frame_index(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()  # от корня к листу, как ждёт speedscope
+            self._samples.append(tuple(stack))
+
+    def __enter__(self) -> "SamplingProfiler":
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="exo-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.elapsed_s = time.perf_counter() - self._t0
+
+    def call(self, fn, *args, **kwargs):
+        """fn(*args) в текущем потоке под профайлером."""
+        with self:
+            return fn(*args, **kwargs)
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    # ---- экспорт ----
+    def top(self, n: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+        """Функции с наибольшим собственным (self) и суммарным (total) временем, мс."""
+        names = {i: f"{k[0]} ({os.path.basename(k[1])}:{k[2]})" for k, i in self._frames.items()}
+        self_counts, total_counts = Counter(), Counter()
+        for stack in self._samples:
+            if stack:
+                self_counts[stack[-1]] += 1
+            total_counts.update(set(stack))
+        ms = self.interval_s * 1000.0
+        return [{"function": names[i], "self_ms": c * ms, "total_ms": total_counts[i] * ms}
+                for i, c in self_counts.most_common(n)]
+
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        frames = [None] * len(self._frames)
+        for (func, filename, line), i in self._frames.items():
+            frames[i] = {"name": func, "file": filename, "line": line}
+        ms = self.interval_s * 1000.0
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "exoplanet-detector backend",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": len(self._samples) * ms,
+                "samples": [list(s) for s in self._samples],
+                "weights": [ms] * len(self._samples),
+            }],
+        }
+
+
+class ProfileStore:
+    """Кольцо последних PROFILE_RETAIN профилей на диске: <id>.speedscope.json + <id>.meta.json."""
+
+    def __init__(self, directory: str = PROFILE_DIR, retain: int = PROFILE_RETAIN):
+        self.directory = directory
+        self.retain = max(1, retain)
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{kind}.json")
+
+    def save(self, endpoint: str, prof: SamplingProfiler, meta: Dict[str, Any]) -> str:
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(prof.started_at)) + f"{int(prof.started_at * 1000) % 1000:03d}"
+        profile_id = f"{stamp}-{endpoint}-{uuid.uuid4().hex[:8]}"
+        meta = dict(meta, id=profile_id, endpoint=endpoint, created_at=prof.started_at,
+                    duration_s=prof.elapsed_s, samples=len(prof._samples),
+                    interval_ms=prof.interval_s * 1000.0, pid=os.getpid(), top=prof.top())
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            with open(self._path(profile_id, "speedscope"), "w", encoding="utf-8") as fh:
+                json.dump(prof.to_speedscope(f"{endpoint} {profile_id}"), fh)
+            # meta пишется последним: по нему профиль виден в списке
+            with open(self._path(profile_id, "meta"), "w", encoding="utf-8") as fh:
+                json.dump(meta, fh)
+            self._evict()
+        return profile_id
+
+    def _ids(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        # id начинается с UTC-времени (до мс): сортировка по имени = по времени создания
+        return sorted(n[:-len(".meta.json")] for n in names if n.endswith(".meta.json"))
+
+    def _evict(self) -> None:
+        for profile_id in self._ids()[:-self.retain]:
+            for kind in ("meta", "speedscope"):
+                try:
+                    os.remove(self._path(profile_id, kind))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        out = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(self._path(profile_id, "meta"), encoding="utf-8") as fh:
+                    out.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+        return out
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """Путь к speedscope-файлу или None (id проверяется по шаблону — без обхода каталогов)."""
+        if not _ID_RE.match(profile_id):
+            return None
+        p = self._path(profile_id, "speedscope")
+        return p if os.path.exists(p) else None
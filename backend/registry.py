@@ -0,0 +1,305 @@
+# backend/registry.py
+"""
+Реестр моделей: несколько версий бандлов (модель + предобработка) бок о бок.
+
+Бандлы описываются в манифесте (models.json), пути — относительно каталога манифеста:
+  {
+    "max_loaded": 4,                  # сколько бандлов держать в памяти (LRU)
+    "preload": ["lightcurve-v1"],     # загружать сразу (по умолчанию — всё, что есть в routes)
+    "bundles": {
+      "lightcurve-v1": {"kind": "lightcurve", "model": "lgb_model.txt", ..., "threshold": 0.52,
+                        "preprocessing": {"step_days": 0.0416667, "med_kernel_hours": 25}},
+      "features-v2":   {"kind": "features", "model": "lgb_model_v2.txt", ...}
+    },
+    "routes": {                       # эндпоинт -> доля трафика по бандлам
+      "predict": {"lightcurve-v1": 1.0},
+      "predict_second": {"features-v2": 1.0}
+    }
+  }
+
+Запрос выбирает бандл явно (?model=<name>) или по весам routes.
+Статистика латентности/пропускной способности копится в STATS и не сбрасывается при reload.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import joblib
+import lightgbm as lgb
+
+# kind бандла -> эндпоинты, которые он умеет обслуживать
+KIND_ENDPOINTS = {
+    "lightcurve": {"predict"},
+    "features": {"predict_second"},
+}
+
+DEFAULT_MAX_LOADED = 4
+
+
+class UnknownModelError(KeyError):
+    """Запрошенной версии нет в манифесте или она не подходит эндпоинту."""
+
+
+def _load_threshold(spec: Dict[str, Any], base: str) -> float:
+    threshold = float(spec.get("threshold", 0.5))
+    tfile = spec.get("threshold_file")
+    if tfile and os.path.exists(os.path.join(base, tfile)):
+        try:
+            threshold = float(joblib.load(os.path.join(base, tfile)))
+        except Exception:
+            pass
+    return threshold
+
+
+def _require_files(name: str, spec: Dict[str, Any], base: str, keys: List[str]) -> None:
+    for key in keys:
+        path = os.path.join(base, spec.get(key) or "")
+        if not spec.get(key) or not os.path.exists(path):
+            raise RuntimeError(f"{name}: {key} file not found: {path}")
+
+
+def _load_lightcurve(name: str, spec: Dict[str, Any], base: str) -> SimpleNamespace:
+    _require_files(name, spec, base, ["model", "scaler", "feature_cols", "binary_cols", "continouos_cols"])
+    return SimpleNamespace(
+        model=lgb.Booster(model_file=os.path.join(base, spec["model"])),
+        scaler=joblib.load(os.path.join(base, spec["scaler"])),
+        feature_cols=joblib.load(os.path.join(base, spec["feature_cols"])),
+        binary_cols=joblib.load(os.path.join(base, spec["binary_cols"])),
+        continouos_cols=joblib.load(os.path.join(base, spec["continouos_cols"])),
+        imputer=None,
+    )
+
+
+def _load_features(name: str, spec: Dict[str, Any], base: str) -> SimpleNamespace:
+    _require_files(name, spec, base, ["model", "scaler", "imputer", "feature_cols"])
+    model_path = os.path.join(base, spec["model"])
+    # model: try LightGBM booster first, else joblib.load
+    try:
+        model = lgb.Booster(model_file=model_path)
+    except Exception:
+        try:
+            model = joblib.load(model_path)
+        except Exception as e:
+            raise RuntimeError(f"{name}: cannot load model: {e}")
+    return SimpleNamespace(
+        model=model,
+        scaler=joblib.load(os.path.join(base, spec["scaler"])),
+        imputer=joblib.load(os.path.join(base, spec["imputer"])),
+        feature_cols=list(joblib.load(os.path.join(base, spec["feature_cols"]))),
+        binary_cols=None,
+        continouos_cols=None,
+    )
+
+
+LOADERS = {
+    "lightcurve": _load_lightcurve,
+    "features": _load_features,
+}
+
+
+class ModelRegistry:
+    """Бандлы из манифеста; загруженные держатся в LRU (OrderedDict) не больше max_loaded штук."""
+
+    def __init__(self, manifest: Dict[str, Any], base_dir: str):
+        self.base_dir = base_dir
+        self.specs: Dict[str, Dict[str, Any]] = dict(manifest.get("bundles") or {})
+        self.routes: Dict[str, Dict[str, float]] = dict(manifest.get("routes") or {})
+        self.max_loaded = max(1, int(manifest.get("max_loaded", DEFAULT_MAX_LOADED)))
+        for name, spec in self.specs.items():
+            if spec.get("kind") not in LOADERS:
+                raise ValueError(f"Bundle {name}: unknown kind {spec.get('kind')!r}")
+        for endpoint, weights in self.routes.items():
+            for name in weights:
+                if name not in self.specs:
+                    raise ValueError(f"Route {endpoint}: unknown bundle {name!r}")
+        self._loaded: "OrderedDict[str, SimpleNamespace]" = OrderedDict()
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in self.specs}
+        preload = manifest.get("preload")
+        if preload is None:
+            preload = [n for weights in self.routes.values() for n in weights]
+        self._preload = list(dict.fromkeys(preload))
+
+    @classmethod
+    def from_manifest(cls, path: str) -> "ModelRegistry":
+        with open(path, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        reg = cls(manifest, os.path.dirname(os.path.abspath(path)))
+        reg.preload()
+        return reg
+
+    def preload(self) -> None:
+        """Загрузка бандлов по умолчанию; ошибка одного бандла не мешает остальным."""
+        for name in self._preload[:self.max_loaded]:
+            try:
+                self.get(name)
+                print(f"Model bundle {name} loaded.")
+            except Exception as e:
+                print(f"Model bundle {name} not loaded: {e}")
+
+    @staticmethod
+    def manifest_files(path: str) -> List[str]:
+        """Манифест + файлы всех бандлов (без загрузки) — для отпечатка версии в ArtifactStore."""
+        paths = [path]
+        try:
+            with open(path, encoding="utf-8") as fh:
+                specs = (json.load(fh).get("bundles") or {}).values()
+        except Exception:
+            return paths
+        base = os.path.dirname(os.path.abspath(path))
+        for spec in specs:
+            for key in ("model", "scaler", "imputer", "feature_cols", "binary_cols", "continouos_cols", "threshold_file"):
+                if spec.get(key):
+                    paths.append(os.path.join(base, spec[key]))
+        return paths
+
+    # ---- загрузка / LRU ----
+    def peek(self, name: str) -> Optional[SimpleNamespace]:
+        """Уже загруженный бандл (с отметкой в LRU) или None — без загрузки с диска."""
+        if name not in self.specs:
+            raise UnknownModelError(name)
+        with self._lock:
+            bundle = self._loaded.get(name)
+            if bundle is not None:
+                self._loaded.move_to_end(name)
+            return bundle
+
+    def get(self, name: str) -> SimpleNamespace:
+        if name not in self.specs:
+            raise UnknownModelError(name)
+        with self._lock:
+            bundle = self._loaded.get(name)
+            if bundle is not None:
+                self._loaded.move_to_end(name)
+                return bundle
+        # загрузка вне общего лока: медленная загрузка одного бандла не блокирует остальные
+        with self._load_locks[name]:
+            with self._lock:
+                bundle = self._loaded.get(name)
+            if bundle is not None:
+                return bundle
+            spec = self.specs[name]
+            try:
+                bundle = LOADERS[spec["kind"]](name, spec, self.base_dir)
+            except Exception as e:
+                self._errors[name] = str(e)
+                raise
+            bundle.name = name
+            bundle.kind = spec["kind"]
+            bundle.threshold = _load_threshold(spec, self.base_dir)
+            bundle.preprocessing = dict(spec.get("preprocessing") or {})
+            bundle.loaded_at = time.time()
+            self._errors.pop(name, None)
+            with self._lock:
+                self._loaded[name] = bundle
+                self._loaded.move_to_end(name)
+                while len(self._loaded) > self.max_loaded:
+                    # запросы, уже взявшие ссылку на выгружаемый бандл, дорабатывают на ней
+                    evicted, _ = self._loaded.popitem(last=False)
+                    print(f"Model bundle {evicted} unloaded (LRU).")
+            return bundle
+
+    # ---- маршрутизация ----
+    def resolve(self, endpoint: str, version: Optional[str] = None, routing_key: Optional[str] = None) -> str:
+        """
+        Имя бандла для запроса: явная версия, иначе доля трафика из routes.
+        routing_key (например, хеш загруженных файлов) делает выбор детерминированным.
+        """
+        if version:
+            spec = self.specs.get(version)
+            if spec is None or endpoint not in KIND_ENDPOINTS.get(spec.get("kind"), set()):
+                raise UnknownModelError(version)
+            return version
+        weights = [(n, float(w)) for n, w in (self.routes.get(endpoint) or {}).items() if float(w) > 0]
+        if not weights:
+            raise UnknownModelError(f"no route for {endpoint}")
+        if len(weights) == 1:
+            return weights[0][0]
+        total = sum(w for _, w in weights)
+        if routing_key is not None:
+            digest = hashlib.sha1(routing_key.encode()).digest()
+            x = int.from_bytes(digest[:8], "big") / 2 ** 64 * total
+        else:
+            x = random.random() * total
+        acc = 0.0
+        for name, w in weights:
+            acc += w
+            if x < acc:
+                return name
+        return weights[-1][0]
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = list(self._loaded.keys())
+            thresholds = {n: b.threshold for n, b in self._loaded.items()}
+        return {
+            "bundles": {
+                name: {
+                    "kind": spec.get("kind"),
+                    "loaded": name in loaded,
+                    "error": self._errors.get(name),
+                    "threshold": thresholds.get(name, spec.get("threshold")),
+                    "preprocessing": spec.get("preprocessing") or {},
+                }
+                for name, spec in self.specs.items()
+            },
+            "routes": self.routes,
+            "max_loaded": self.max_loaded,
+            "lru_order": loaded,
+        }
+
+
+class ModelStats:
+    """Латентность и пропускная способность по бандлам (скользящее окно последних запросов)."""
+
+    def __init__(self, window: int = 1024, rate_window_s: float = 60.0):
+        self._lock = threading.Lock()
+        self._window = window
+        self._rate_window_s = rate_window_s
+        self._data: Dict[str, Dict[str, Any]] = {}
+        # rps_overall считается от запуска, а не от первого завершённого запроса:
+        # иначе один запрос длиной 10 мс давал ~100 rps
+        self._started = time.time()
+
+    def record(self, name: str, seconds: float, ok: bool = True) -> None:
+        now = time.time()
+        with self._lock:
+            d = self._data.get(name)
+            if d is None:
+                d = {"count": 0, "errors": 0, "total_s": 0.0,
+                     "lat": deque(maxlen=self._window), "ts": deque(maxlen=self._window)}
+                self._data[name] = d
+            d["count"] += 1
+            d["errors"] += 0 if ok else 1
+            d["total_s"] += seconds
+            d["lat"].append(seconds)
+            d["ts"].append(now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        out = {}
+        with self._lock:
+            for name, d in self._data.items():
+                lat = sorted(d["lat"])
+                recent = sum(1 for t in d["ts"] if now - t <= self._rate_window_s)
+                out[name] = {
+                    "count": d["count"],
+                    "errors": d["errors"],
+                    "mean_ms": 1e3 * d["total_s"] / d["count"],
+                    "p50_ms": 1e3 * lat[len(lat) // 2],
+                    "p95_ms": 1e3 * lat[min(len(lat) - 1, int(0.95 * len(lat)))],
+                    "max_ms": 1e3 * lat[-1],
+                    "rps_recent": recent / self._rate_window_s,
+                    "rps_overall": d["count"] / max(1.0, now - self._started),
+                }
+        return out
+
+
+STATS = ModelStats()
@@ -0,0 +1,124 @@
+# backend/serve.py
+"""
+Pre-fork запуск backend: артефакты модели загружаются ОДИН раз в master-процессе,
+после чего master форкает N воркеров uvicorn на общем сокете.
+
+Воркеры наследуют уже загруженные LightGBM/скейлеры/списки колонок copy-on-write:
+память на воркер почти не растёт, холодный старт не повторяется.
+Общий счётчик версий артефактов лежит в разделяемой памяти: POST /admin/reload
+на любом воркере перечитывает файлы, остальные подхватывают новую версию при следующем запросе.
+
+Только Linux/macOS (нужен os.fork). На Windows используйте обычный `uvicorn main:app`.
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, log_level: str, artifacts) -> None:
+    # сигналы master -> воркер обрабатывает сам uvicorn (graceful shutdown)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # перезапущенный воркер наследует набор master, а общая версия могла уйти вперёд — догоняем до приёма запросов
+    artifacts.catch_up()
+    config = uvicorn.Config(app, log_level=log_level)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, log_level: str, artifacts) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock, log_level, artifacts)
+        except BaseException as e:
+            print(f"[worker {os.getpid()}] crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main_cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Pre-fork server: load model artifacts once, share them copy-on-write")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        print("os.fork is not available on this platform; run `uvicorn main:app` instead.")
+        return 2
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
+    # до импорта main: n_jobs tsfresh в mode=segments делит ядра между воркерами
+    os.environ.setdefault("EXO_WORKERS", str(max(1, args.workers)))
+    import main  # загрузка артефактов — один раз, здесь
+
+    main.ARTIFACTS.enable_shared_version()
+    main.ADMISSION.enable_shared()  # бюджет памяти/CPU — один на все воркеры
+    # всё, что загружено до fork, переносим в «вечное» поколение GC:
+    # сборщик не будет трогать заголовки этих объектов в воркерах и ломать copy-on-write
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(args.host, args.port)
+    print(f"[master {os.getpid()}] artifacts v{main.ARTIFACTS.info()['version']} loaded, "
+          f"starting {args.workers} workers on {args.host}:{args.port}")
+
+    workers = {_spawn(main.app, sock, args.log_level, main.ARTIFACTS) for _ in range(max(1, args.workers))}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            # упавший воркер перезапускаем от того же master — артефакты наследуются без загрузки,
+            # если с тех пор не было reload (иначе воркер догрузит текущую версию в catch_up)
+            print(f"[master] worker {pid} exited ({status}), restarting")
+            time.sleep(0.5)
+            workers.add(_spawn(main.app, sock, args.log_level, main.ARTIFACTS))
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,124 @@
+# backend/singleflight.py
+"""
+Single-flight: одинаковые запросы, пришедшие одновременно, ждут ОДНО вычисление.
+
+Ключ — хеш содержимого загрузок + параметры (эндпоинт, версия модели).
+Первый запрос («лидер») запускает вычисление отдельной задачей, остальные с тем же ключом
+ждут её результата (или исключения). Задача не отменяется, если отвалился клиент лидера, —
+её всё ещё ждут другие. После завершения ключ удаляется: кэша результатов здесь нет.
+Дедупликация действует в пределах одного процесса (воркера).
+
+stream() — то же для потоковых ответов: вычисление выдаёт события по стадиям, каждый
+ожидающий получает все события с начала (опоздавший — сначала уже готовые), затем новые.
+"""
+import asyncio
+import hashlib
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+
+def content_key(*parts: Any, blobs: Iterable[bytes] = ()) -> str:
+    """sha256 от параметров и содержимого загрузок (в порядке загрузки)."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(repr(p).encode())
+        h.update(b"\0")
+    for b in blobs:
+        h.update(hashlib.sha256(b).digest())
+    return h.hexdigest()
+
+
+class _Broadcast:
+    """События одного потокового вычисления: накапливаются, ожидающие читают их по индексу."""
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self._waiters: Dict[str, int] = {}
+        self._lock = threading.Lock()  # счётчики читаются из других потоков (/stats)
+        self.computations = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 1
+            with self._lock:
+                self.computations += 1
+            task.add_done_callback(lambda _t, k=key: self._done(k))
+        else:
+            self._waiters[key] += 1
+            with self._lock:
+                self.coalesced += 1
+                self.max_waiters = max(self.max_waiters, self._waiters[key])
+        # shield: отмена одного ожидающего не отменяет общее вычисление
+        return await asyncio.shield(task)
+
+    def _done(self, key: str) -> None:
+        self._inflight.pop(key, None)
+        self._waiters.pop(key, None)
+
+    async def stream(self, key: str, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Потоковый single-flight: fn() — асинхронный генератор событий, запускается один раз на ключ
+        отдельной задачей (не отменяется, если отключился клиент лидера). Исключение генератора
+        пробрасывается каждому ожидающему после уже выданных событий.
+        """
+        b = self._streams.get(key)
+        if b is None:
+            b = self._streams[key] = _Broadcast()
+            with self._lock:
+                self.computations += 1
+            asyncio.ensure_future(self._pump(key, b, fn))
+        else:
+            with self._lock:
+                self.coalesced += 1
+        i = 0
+        while True:
+            async with b.changed:
+                await b.changed.wait_for(lambda: len(b.items) > i or b.done)
+                new, done = b.items[i:], b.done
+            i += len(new)
+            for item in new:
+                yield item
+            if done and i >= len(b.items):
+                if b.error is not None:
+                    raise b.error
+                return
+
+    async def _pump(self, key: str, b: _Broadcast, fn: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async for item in fn():
+                async with b.changed:
+                    b.items.append(item)
+                    b.changed.notify_all()
+        except BaseException as e:
+            b.error = e
+            if not isinstance(e, Exception):
+                raise  # отмена задачи (остановка сервера): ожидающие получат её же
+        finally:
+            # ключ снимаем до пробуждения ожидающих: новый запрос после этого — новое вычисление
+            self._streams.pop(key, None)
+            async with b.changed:
+                b.done = True
+                b.changed.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "computations": self.computations,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight) + len(self._streams),
+                "max_waiters": self.max_waiters,
+            }
@@ -0,0 +1,8 @@
+# backend/tests/conftest.py
+# тесты импортируют main и bench.* как при запуске из каталога backend
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,29 @@
+# backend/tests/test_precision.py
+"""Дрейф компактного режима float32 относительно float64 на синтетических кривых (bench.synth)."""
+import pytest
+
+from bench import precision, synth
+from bench.common import import_backend
+
+
+@pytest.fixture(scope="module")
+def main():
+    return import_backend()
+
+
+@pytest.fixture(scope="module")
+def base_bundle(main):
+    registry = main.ARTIFACTS.current()
+    return registry.get(registry.resolve("predict"))
+
+
+@pytest.mark.parametrize("size,seed", [("small", 0), ("small", 1), ("small", 2), ("medium", 0)])
+def test_float32_drift_within_bound(main, base_bundle, size, seed):
+    files = synth.make_fits_set(size, seed=seed)
+    r64 = main._run_predict(files, precision._with_precision(main, base_bundle, "float64"))
+    r32 = main._run_predict(files, precision._with_precision(main, base_bundle, "float32"))
+    d = precision.drift(r64, r32)
+    assert d["probability_abs"] <= precision.DEFAULT_MAX_DRIFT
+    # кривая на сетке совпадает с точностью float32, а не «примерно»
+    assert d["processed_flux_max_abs_over_std"] is not None
+    assert d["processed_flux_max_abs_over_std"] <= 1e-4
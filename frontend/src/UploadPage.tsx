@@ -3,6 +3,7 @@ import React, { useRef, useState, useMemo } from "react";
 import axios from "axios";
 import { useNavigate } from "react-router-dom";
 import backIcon from './components/weui_back-filled.png';
+import LightCurveChart from './components/LightCurveChart';
 // вставь этот код в верхнюю часть файла (например под импорты)
 
 // Полностью замените текущий ResultsTable на этот код
@@ -648,6 +649,23 @@ const GlowingCircles= ({ centerX = 50, centerY = 70, size = 400, opacity = 0.8 }
     }} />
   );
 };
+// stages of /predict_stream (NDJSON) -> status line while the rest is still computing
+const STREAM_STAGE_LABELS: { [k: string]: string } = {
+  raw_curve: "Raw curve received, detrending...",
+  processed_curve: "Processed curve ready, searching for transits...",
+  candidates: "Candidates found, running classifier...",
+  prediction: "Prediction ready",
+  done: "Done",
+};
+
+// FastAPI `detail` may be a string or an object (413 from admission: {message, admission}); never show "[object Object]"
+const detailText = (detail: any, fallback: string): string => {
+  if (detail == null) return fallback;
+  if (typeof detail === "string") return detail;
+  if (typeof detail.message === "string") return detail.message;
+  return JSON.stringify(detail);
+};
+
 export default function UploadPage() {
   const navigate = useNavigate();
 
@@ -659,6 +677,8 @@ export default function UploadPage() {
   const [fitsFiles, setFitsFiles] = useState<File[]>([]);
   const [loadingV1, setLoadingV1] = useState(false);
   const [resultV1, setResultV1] = useState<any>(null);
+  const [streamStage, setStreamStage] = useState<string | null>(null);
+  const [perQuarter, setPerQuarter] = useState(false); // mode=segments: one probability per quarter + aggregate
 
   // V2
   const csvRef = useRef<HTMLInputElement | null>(null);
@@ -765,16 +785,50 @@ const [koiKepmag, setKoiKepmag] = useState("");
       const fd = new FormData();
       fitsFiles.forEach((f) => fd.append("files", f));
       setLoadingV1(true);
+      setResultV1(null);
+      setStreamStage(null);
+      // streaming variant: curves arrive long before tsfresh + classifier finish, render them right away
       try {
-        const res = await axios.post("http://localhost:8000/predict", fd, {
-          headers: { "Content-Type": "multipart/form-data" },
-          timeout: 120000,
-        });
-        setResultV1(res.data);
-        localStorage.setItem("analysisData", JSON.stringify(res.data));
+        const url = "http://localhost:8000/predict_stream" + (perQuarter ? "?mode=segments" : "");
+        const res = await fetch(url, { method: "POST", body: fd });
+        if (!res.ok || !res.body) {
+          let detail = "See console";
+          try {
+            const body = await res.json();
+            detail = detailText(body?.detail, detail);
+          } catch { /* not JSON */ }
+          throw new Error(detail);
+        }
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let acc: any = {};
+        const applyEvent = (ev: any) => {
+          if (ev.stage === "error") throw new Error(detailText(ev.detail, "Prediction failed"));
+          const { stage, ...payload } = ev;
+          if (stage !== "done") {
+            acc = { ...acc, ...payload };
+            setResultV1(acc);
+          }
+          setStreamStage(stage);
+        };
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          let nl = buffer.indexOf("\n");
+          while (nl >= 0) {
+            const line = buffer.slice(0, nl).trim();
+            buffer = buffer.slice(nl + 1);
+            if (line) applyEvent(JSON.parse(line));
+            nl = buffer.indexOf("\n");
+          }
+        }
+        if (buffer.trim()) applyEvent(JSON.parse(buffer));
+        localStorage.setItem("analysisData", JSON.stringify(acc));
       } catch (err: any) {
         console.error(err);
-        alert(`Upload failed: ${err?.response?.data?.detail ?? "See console"}`);
+        alert(`Upload failed: ${err?.message ?? "See console"}`);
       } finally {
         setLoadingV1(false);
       }
@@ -830,6 +884,11 @@ To use this model, prepare one or more files containing time-series photometry w
             </div>
           </div>
 
+          <label style={{ display: "block", marginTop: 12, textAlign: "center", cursor: "pointer" }}>
+            <input type="checkbox" checked={perQuarter} onChange={(e) => setPerQuarter(e.target.checked)} />
+            {" "}Classify each quarter separately
+          </label>
+
           {/* gap is plain black */}
           <div style={styles.blackGap} />
 
@@ -837,9 +896,54 @@ To use this model, prepare one or more files containing time-series photometry w
           {resultV1 && (
             <div style={styles.resultBox}>
               <div style={{ fontWeight: 700 }}>Result</div>
-              <div style={{ marginTop: 8 }}>Probability: {(resultV1.probability * 100).toFixed?.(2) ?? resultV1.probability}</div>
-              <div>Exoplanet: {resultV1.exoplanet ? "Yes" : "No"}</div>
-              <button style={styles.analyzeBtn} onClick={() => navigate("/analysis")}>Analyze manually</button>
+              {loadingV1 && streamStage && (
+                <div style={{ marginTop: 8, opacity: 0.7 }}>{STREAM_STAGE_LABELS[streamStage] ?? streamStage}</div>
+              )}
+              {resultV1.probability != null ? (
+                <>
+                  <div style={{ marginTop: 8 }}>Probability: {(resultV1.probability * 100).toFixed?.(2) ?? resultV1.probability}</div>
+                  <div>Exoplanet: {resultV1.exoplanet ? "Yes" : "No"}</div>
+                  {resultV1.degraded && (
+                    <div style={{ marginTop: 4, color: "#f5a623" }}>
+                      Upload was too large: processed on a {resultV1.admission?.degrade_factor ?? ""}x coarser grid,
+                      treat the probability as an estimate only.
+                    </div>
+                  )}
+                </>
+              ) : (
+                <div style={{ marginTop: 8 }}>Probability: computing...</div>
+              )}
+              {resultV1.aggregate && (
+                <div style={{ marginTop: 8 }}>
+                  <div>
+                    Per quarter ({resultV1.aggregate.method} of {resultV1.aggregate.n_segments},{" "}
+                    {resultV1.aggregate.positive_segments} positive):
+                  </div>
+                  {(resultV1.segments ?? []).map((s: any) => (
+                    <div key={s.index} style={{ opacity: s.skipped ? 0.5 : 1 }}>
+                      #{s.index + 1} {s.start.toFixed(1)}–{s.end.toFixed(1)}:{" "}
+                      {s.probability != null ? `${(s.probability * 100).toFixed(2)}%` : "too short, skipped"}
+                    </div>
+                  ))}
+                </div>
+              )}
+              {resultV1.raw_curve && (
+                <div style={{ marginTop: 12 }}>
+                  {/* remount when the processed curve streams in: view mode / zoom start from the processed view */}
+                  <LightCurveChart
+                    key={resultV1.processed_curve ? "processed" : "raw"}
+                    rawCurve={resultV1.raw_curve}
+                    processedCurve={resultV1.processed_curve ?? resultV1.raw_curve}
+                    transitCandidates={resultV1.transit_candidates ?? []}
+                    showRaw={!resultV1.processed_curve}
+                    showProcessed={!!resultV1.processed_curve}
+                    segments={resultV1.segments ?? []}
+                  />
+                </div>
+              )}
+              {!loadingV1 && resultV1.probability != null && (
+                <button style={styles.analyzeBtn} onClick={() => navigate("/analysis")}>Analyze manually</button>
+              )}
             </div>
           )}
         </div>
@@ -935,7 +1039,7 @@ const submitV2Csv = async () => {
     localStorage.setItem("analysisData_v2", JSON.stringify(res.data));
   } catch (err: any) {
     console.error(err);
-    alert(`CSV upload failed: ${err?.response?.data?.detail ?? "See console"}`);
+    alert(`CSV upload failed: ${detailText(err?.response?.data?.detail, "See console")}`);
   } finally {
     setLoadingV2(false);
   }
@@ -995,7 +1099,7 @@ const submitV2Manual = async () => {
     localStorage.setItem("analysisData_v2", JSON.stringify(res.data));
   } catch (err: any) {
     console.error(err);
-    alert(`Manual submit failed: ${err?.response?.data?.detail ?? "See console"}`);
+    alert(`Manual submit failed: ${detailText(err?.response?.data?.detail, "See console")}`);
   } finally {
     setLoadingV2(false);
   }
@@ -1,5 +1,4 @@
 import React, { useState, useEffect, useMemo } from 'react';
-import axios from 'axios';
 import ReactPaginate from 'react-paginate';
 import './Catalog.css';
 import PageContainer from './PageContainer';
@@ -11,6 +10,7 @@ import ResultsPanel from './ResultsPanel';
 import PlanetPopup from './PlanetPopup';
 import PlanetCard from './PlanetCard';
 import LoadingIndicator from './LoadingIndicator'; // Import the new component
+import { usePlanetData, CatalogItem } from './usePlanetData';
 
 const planetImageMap: Record<string, string[]> = {
   'Terrestrial': [
@@ -53,8 +53,6 @@ const getRandomImage = (planetType: string, index: number) => {
   return images[index % images.length];
 };
 
-let planetIdCounter = 0;
-
 interface Planet {
   id: string;
   name: string;
@@ -88,125 +86,63 @@ function PlanetGrid({ currentItems, onPlanetClick }: { currentItems: Planet[], o
   );
 }
 
+const toPlanet = (d: CatalogItem, index: number): Planet => ({
+  id: d.id,
+  name: d.name,
+  imageUrl: getRandomImage(d.planet_type, index),
+  source: d.mission,
+  type: d.planet_type,
+  disposition: d.disposition,
+  orbitalPeriod: d.koi_period as number,
+  transitEpoch: d.koi_time0bk as number,
+  transitDuration: d.koi_duration as number,
+  transitDepth: d.koi_depth as number,
+  planetaryRadius: d.koi_prad as number,
+  equilibriumTemperature: d.koi_teq as number,
+  insolationFlux: d.koi_insol as number,
+  tcePlanetNumber: d.koi_tce_plnt_num as number,
+  stellarEffectiveTemperature: d.koi_steff as number,
+  stellarSurfaceGravity: d.koi_slogg as number,
+  stellarRadius: d.koi_srad as number,
+  magnitude: d.koi_kepmag as number,
+});
+
 function CatalogPage() {
-  const [allPlanets, setAllPlanets] = useState<Planet[]>([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    loading,
+    error,
+    retry,
+    isSample,
+    items,
+    totalCount,
+    pageCount,
+    currentPage,
+    setCurrentPage,
+    searchTerm,
+    setSearchTerm,
+    planetType,
+    setPlanetType,
+    mission,
+    setMission,
+    clearFilters,
+  } = usePlanetData(ITEMS_PER_PAGE);
+  const [initialLoading, setInitialLoading] = useState(true);
   const [contentLoaded, setContentLoaded] = useState(false);
-  const [error, setError] = useState<string | null>(null);
-  const [searchTerm, setSearchTerm] = useState('');
-  const [debouncedSearchTerm, setDebouncedSearchTerm] = useState('');
-  const [planetType, setPlanetType] = useState('all');
-  const [mission, setMission] = useState('all');
   const [selectedPlanet, setSelectedPlanet] = useState<any | null>(null);
 
-  // Pagination state
-  const [currentPage, setCurrentPage] = useState(0);
-
-  // Data fetching
-  useEffect(() => {
-    const fetchAllPlanets = async () => {
-      setLoading(true);
-      setError(null);
-      try {
-        const keplerURL = "/cgi-bin/nstedAPI/nph-nstedAPI?table=cumulative&select=kepid,kepler_name,koi_disposition,koi_period,koi_time0bk,koi_duration,koi_depth,koi_prad,koi_teq,koi_insol,koi_tce_plnt_num,koi_steff,koi_slogg,koi_srad,koi_kepmag&where=koi_disposition='CONFIRMED'&format=json";
-        const tessURL = "/cgi-bin/nstedAPI/nph-nstedAPI?table=toi&select=tid,tfopwg_disp,pl_orbper,pl_tranmid,pl_trandurh,pl_trandep,pl_rade,pl_eqt,pl_insol,pl_pnum,st_teff,st_logg,st_rad,st_tmag&where=tfopwg_disp='CP' or tfopwg_disp='KP'&format=JSON";
-
-        const [keplerRes, tessRes] = await Promise.all([
-          axios.get(keplerURL),
-          axios.get(tessURL),
-        ]);
-
-        const kepler = keplerRes.data.map((d: any, index: number) => {
-          const radius = d.koi_prad;
-          let type = 'Unknown';
-          if (radius > 0) {
-            if (radius < 1.6) type = 'Terrestrial';
-            else if (radius < 4) type = 'Superearth';
-            else if (radius < 10) type = 'Neptune-like';
-            else type = 'Gas giant';
-          }
-          return {
-            id: `planet-${planetIdCounter++}`,
-            name: d.kepler_name || `Kepid ${d.kepid}`,
-            imageUrl: getRandomImage(type, index),
-            source: "Kepler",
-            type: type,
-            disposition: d.koi_disposition,
-            orbitalPeriod: d.koi_period,
-            transitEpoch: d.koi_time0bk,
-            transitDuration: d.koi_duration,
-            transitDepth: d.koi_depth,
-            planetaryRadius: radius,
-            equilibriumTemperature: d.koi_teq,
-            insolationFlux: d.koi_insol,
-            tcePlanetNumber: d.koi_tce_plnt_num,
-            stellarEffectiveTemperature: d.koi_steff,
-            stellarSurfaceGravity: d.koi_slogg,
-            stellarRadius: d.koi_srad,
-            magnitude: d.koi_kepmag,
-          };
-        });
-
-        const tess = tessRes.data.map((d: any, index: number) => {
-          const radius = d.pl_rade;
-          let type = 'Unknown';
-          if (radius > 0) {
-            if (radius < 1.6) type = 'Terrestrial';
-            else if (radius < 4) type = 'Superearth';
-            else if (radius < 10) type = 'Neptune-like';
-            else type = 'Gas giant';
-          }
-          return {
-            id: `planet-${planetIdCounter++}`,
-            name: `TID ${d.tid}`,
-            imageUrl: getRandomImage(type, kepler.length + index),
-            source: "TESS",
-            type: type,
-            disposition: d.tfopwg_disp,
-            orbitalPeriod: d.pl_orbper,
-            transitEpoch: d.pl_tranmid,
-            transitDuration: d.pl_trandurh,
-            transitDepth: d.pl_trandep,
-            planetaryRadius: radius,
-            equilibriumTemperature: d.pl_eqt,
-            insolationFlux: d.pl_insol,
-            tcePlanetNumber: d.pl_pnum,
-            stellarEffectiveTemperature: d.st_teff,
-            stellarSurfaceGravity: d.st_logg,
-            stellarRadius: d.st_rad,
-            magnitude: d.st_tmag,
-          };
-        });
-
-        setAllPlanets([...kepler, ...tess]);
-      } catch (err) {
-        setError('Failed to fetch planets. Please try again later.');
-        console.error(err);
-      } finally {
-        setTimeout(() => {
-          setLoading(false);
-          setTimeout(() => setContentLoaded(true), 100); // Short delay for fade-in
-        }, 1500); // Artificial delay to show the animation
-      }
-    };
-
-    fetchAllPlanets();
-  }, []);
-
-  // Debounce search term
+  // Анимация загрузки — только до первой страницы; дальше страницы подгружаются без оверлея
   useEffect(() => {
+    if (!initialLoading || loading) return;
     const timerId = setTimeout(() => {
-      setDebouncedSearchTerm(searchTerm);
-    }, 300); // 300ms delay
-
-    return () => {
-      clearTimeout(timerId);
-    };
-  }, [searchTerm]);
+      setInitialLoading(false);
+      setTimeout(() => setContentLoaded(true), 100); // Short delay for fade-in
+    }, 1500); // Artificial delay to show the animation
+    return () => clearTimeout(timerId);
+  }, [loading, initialLoading]);
 
   // Handle body scroll lock for popup and loading
   useEffect(() => {
-    if (selectedPlanet || loading) {
+    if (selectedPlanet || initialLoading) {
       document.body.style.overflow = 'hidden';
     } else {
       document.body.style.overflow = 'auto';
@@ -214,14 +150,7 @@ function CatalogPage() {
     return () => {
       document.body.style.overflow = 'auto';
     };
-  }, [selectedPlanet, loading]);
-
-  const clearFilters = () => {
-    setSearchTerm('');
-    setPlanetType('all');
-    setMission('all');
-    setCurrentPage(0);
-  };
+  }, [selectedPlanet, initialLoading]);
 
   const openPlanetPopup = (planet: any) => {
     setSelectedPlanet(planet);
@@ -231,35 +160,31 @@ function CatalogPage() {
     setSelectedPlanet(null);
   };
 
-  const filteredPlanets = useMemo(() => {
-    return allPlanets.filter(planet => {
-      const nameMatch = (planet.name || '').toLowerCase().includes(debouncedSearchTerm.toLowerCase());
-      const missionMatch = mission === 'all' || planet.source === mission;
-      const typeMatch = planetType === 'all' || planet.type === planetType;
-      return nameMatch && missionMatch && typeMatch;
-    });
-  }, [allPlanets, debouncedSearchTerm, planetType, mission]);
-
-  // Reset to page 0 when filters change
-  useEffect(() => {
-    setCurrentPage(0);
-  }, [debouncedSearchTerm, planetType, mission]);
-
-  const pageCount = Math.ceil(filteredPlanets.length / ITEMS_PER_PAGE);
-  const offset = currentPage * ITEMS_PER_PAGE;
-  const currentItems = filteredPlanets.slice(offset, offset + ITEMS_PER_PAGE);
+  const currentItems = useMemo(
+    () => items.map((d, i) => toPlanet(d, currentPage * ITEMS_PER_PAGE + i)),
+    [items, currentPage]
+  );
 
   const handlePageClick = (event: { selected: number }) => {
     setCurrentPage(event.selected);
   };
 
   if (error) {
-    return <div>{error}</div>;
+    return (
+      <PageContainer>
+        <BackgroundEffects />
+        <div className="catalog-error" role="alert">
+          <h2>Catalog unavailable</h2>
+          <p>{error}</p>
+          <button className="catalog-error-retry" onClick={retry}>Try again</button>
+        </div>
+      </PageContainer>
+    );
   }
 
   return (
     <PageContainer>
-      <LoadingIndicator show={loading} />
+      <LoadingIndicator show={initialLoading} />
       <div className={`catalog-content ${contentLoaded ? 'loaded' : ''}`}>
         <BackgroundEffects />
         <HeroSection />
@@ -272,13 +197,19 @@ function CatalogPage() {
             clearFilters={clearFilters}
           />
           <ResultsPanel
-            totalCount={filteredPlanets.length}
+            totalCount={totalCount}
             searchValue={searchTerm}
             onSearchChange={setSearchTerm}
             pageCount={pageCount}
             onPageChange={handlePageClick}
             currentPage={currentPage}
           >
+            {isSample && (
+              <div className="catalog-sample-note">
+                Showing a small bundled sample: the full catalog snapshot is not built on the server
+                (<code>python catalog.py snapshot --confirmed-only</code>).
+              </div>
+            )}
             <PlanetGrid currentItems={currentItems} onPlanetClick={openPlanetPopup} />
             {pageCount > 1 && (
               <ReactPaginate
@@ -1,116 +1,119 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
 
-const placeholderImages = [
-  '/b62eabe5863821a86b684aaabf7b687f0c54e25f.jpg',
-  '/50ec4e79b8bb9771d127f621fb27d1245099c441.jpg',
-  '/b8f226896d1a04d4f487ecc66579e97bc32e54ae.jpg',
-];
+// Каталог отдаёт backend из локального снимка (GET /catalog/planets):
+// фильтры, поиск и пагинация считаются на сервере, клиент получает только текущую страницу.
+const CATALOG_URL = 'http://localhost:8000/catalog/planets';
 
-export const usePlanetData = () => {
-  const [allPlanets, setAllPlanets] = useState<any[]>([]);
-  const [filteredPlanets, setFilteredPlanets] = useState<any[]>([]);
+// Как и раньше, в каталоге показываем только подтверждённые планеты (Kepler CONFIRMED, TESS CP/KP)
+const CATALOG_DISPOSITIONS = ['CONFIRMED', 'CP', 'KP'];
+
+export interface CatalogItem {
+  id: string;
+  name: string;
+  mission: string;
+  disposition: string;
+  planet_type: string;
+  koi_period: number | null;
+  koi_time0bk: number | null;
+  koi_duration: number | null;
+  koi_depth: number | null;
+  koi_prad: number | null;
+  koi_teq: number | null;
+  koi_insol: number | null;
+  koi_tce_plnt_num: number | null;
+  koi_steff: number | null;
+  koi_slogg: number | null;
+  koi_srad: number | null;
+  koi_kepmag: number | null;
+}
+
+export const usePlanetData = (pageSize: number) => {
+  const [items, setItems] = useState<CatalogItem[]>([]);
+  const [totalCount, setTotalCount] = useState(0);
+  const [pageCount, setPageCount] = useState(0);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [isSample, setIsSample] = useState(false);
+  const [reloadKey, setReloadKey] = useState(0);
   const [searchTerm, setSearchTerm] = useState('');
+  const [debouncedSearchTerm, setDebouncedSearchTerm] = useState('');
   const [planetType, setPlanetType] = useState('all');
   const [mission, setMission] = useState('all');
+  const [currentPage, setCurrentPage] = useState(0);
 
-  // Data fetching
+  // Debounce search term
   useEffect(() => {
-    const fetchAllPlanets = async () => {
-      setLoading(true);
-      setError(null);
-      try {
-        const keplerURL = "/cgi-bin/nstedAPI/nph-nstedAPI?table=cumulative&select=kepid,kepler_name,koi_disposition,koi_period,koi_time0bk,koi_duration,koi_depth,koi_prad,koi_teq,koi_insol,koi_tce_plnt_num,koi_steff,koi_slogg,koi_srad,koi_kepmag&where=koi_disposition='CONFIRMED'&format=json";
-        const tessURL = "/cgi-bin/nstedAPI/nph-nstedAPI?table=toi&select=tid,tfopwg_disp,pl_orbper,pl_tranmid,pl_trandurh,pl_trandep,pl_rade,pl_eqt,pl_insol,pl_pnum,st_teff,st_logg,st_rad,st_tmag&where=tfopwg_disp='CP' or tfopwg_disp='KP'&format=JSON";
+    const timerId = setTimeout(() => {
+      setDebouncedSearchTerm(searchTerm);
+    }, 300); // 300ms delay
 
-        const [keplerRes, tessRes] = await Promise.all([
-          axios.get(keplerURL),
-          axios.get(tessURL),
-        ]);
+    return () => {
+      clearTimeout(timerId);
+    };
+  }, [searchTerm]);
 
-        const kepler = keplerRes.data.map((d: any, index: number) => ({
-          id: `kepler-${d.kepid}`,
-          name: d.kepler_name || `Kepid ${d.kepid}`,
-          imageUrl: placeholderImages[index % placeholderImages.length],
-          source: "Kepler",
-          disposition: d.koi_disposition,
-          orbitalPeriod: d.koi_period,
-          transitEpoch: d.koi_time0bk,
-          transitDuration: d.koi_duration,
-          transitDepth: d.koi_depth,
-          planetaryRadius: d.koi_prad,
-          equilibriumTemperature: d.koi_teq,
-          insolationFlux: d.koi_insol,
-          tcePlanetNumber: d.koi_tce_plnt_num,
-          stellarEffectiveTemperature: d.koi_steff,
-          stellarSurfaceGravity: d.koi_slogg,
-          stellarRadius: d.koi_srad,
-          magnitude: d.koi_kepmag,
-        }));
+  // Reset to page 0 when filters change
+  useEffect(() => {
+    setCurrentPage(0);
+  }, [debouncedSearchTerm, planetType, mission]);
 
-        const tess = tessRes.data.map((d: any, index: number) => ({
-          id: `tess-${d.tid}`,
-          name: `TID ${d.tid}`,
-          imageUrl: placeholderImages[(kepler.length + index) % placeholderImages.length],
-          source: "TESS",
-          disposition: d.tfopwg_disp,
-          orbitalPeriod: d.pl_orbper,
-          transitEpoch: d.pl_tranmid,
-          transitDuration: d.pl_trandurh,
-          transitDepth: d.pl_trandep,
-          planetaryRadius: d.pl_rade,
-          equilibriumTemperature: d.pl_eqt,
-          insolationFlux: d.pl_insol,
-          tcePlanetNumber: d.pl_pnum,
-          stellarEffectiveTemperature: d.st_teff,
-          stellarSurfaceGravity: d.st_logg,
-          stellarRadius: d.st_rad,
-          magnitude: d.st_tmag,
-        }));
+  // Data fetching: один запрос на страницу, устаревшие ответы отменяются
+  useEffect(() => {
+    const controller = new AbortController();
+    const params = new URLSearchParams();
+    CATALOG_DISPOSITIONS.forEach(d => params.append('disposition', d));
+    if (debouncedSearchTerm) params.set('q', debouncedSearchTerm);
+    if (planetType !== 'all') params.set('planet_type', planetType);
+    if (mission !== 'all') params.set('mission', mission);
+    params.set('page', String(currentPage));
+    params.set('page_size', String(pageSize));
 
-        setAllPlanets([...kepler, ...tess]);
-      } catch (err) {
-        setError('Failed to fetch planets. Please try again later.');
+    setLoading(true);
+    setError(null);
+    axios.get(CATALOG_URL, { params, signal: controller.signal })
+      .then(res => {
+        setItems(res.data.items);
+        setTotalCount(res.data.total);
+        setPageCount(res.data.page_count);
+        setIsSample(!!res.data.sample);
+        setLoading(false);
+      })
+      .catch(err => {
+        if (axios.isCancel(err)) return;
+        // 503: на сервере нет ни снимка каталога, ни встроенной выборки
+        if (err.response?.status === 503) {
+          setError('The planet catalog is not available on the server (no catalog snapshot loaded). '
+            + 'Build it in backend/ with `python catalog.py snapshot --confirmed-only` and restart the server.');
+        } else {
+          setError('Failed to fetch planets. Please try again later.');
+        }
         console.error(err);
-      } finally {
         setLoading(false);
-      }
-    };
+      });
 
-    fetchAllPlanets();
-  }, []);
+    return () => controller.abort();
+  }, [debouncedSearchTerm, planetType, mission, currentPage, pageSize, reloadKey]);
 
-  // Filtering logic
-  useEffect(() => {
-    const filtered = allPlanets.filter(planet => {
-      const nameMatch = (planet.name || '').toLowerCase().includes(searchTerm.toLowerCase());
-      const missionMatch = mission === 'all' || planet.source === mission;
-      const radius = planet.planetaryRadius;
-      let type = 'Unknown';
-      if (radius > 0) {
-        if (radius < 1.6) type = 'Terrestrial';
-        else if (radius < 4) type = 'Superearth';
-        else if (radius < 10) type = 'Neptune-like';
-        else type = 'Gas giant';
-      }
-      const typeMatch = planetType === 'all' || type === planetType;
-      return nameMatch && missionMatch && typeMatch;
-    });
-    setFilteredPlanets(filtered);
-  }, [allPlanets, searchTerm, planetType, mission]);
+  const retry = () => setReloadKey(k => k + 1);
 
   const clearFilters = () => {
     setSearchTerm('');
     setPlanetType('all');
     setMission('all');
+    setCurrentPage(0);
   };
 
   return {
     loading,
     error,
-    filteredPlanets,
+    retry,
+    isSample,
+    items,
+    totalCount,
+    pageCount,
+    currentPage,
+    setCurrentPage,
     searchTerm,
     setSearchTerm,
     planetType,
@@ -119,4 +122,4 @@ export const usePlanetData = () => {
     setMission,
     clearFilters,
   };
-};
\ No newline at end of file
+};